@@ -0,0 +1,140 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+
+from internal.analytics_cache import AnalyticsCache  # noqa: E402
+from internal.db import init_db, init_engine, init_session  # noqa: E402
+from internal.migrations import run_migrations  # noqa: E402
+from internal.models import Transaction  # noqa: E402
+from internal.repositories.transaction_repo import TransactionRepository  # noqa: E402
+from internal.services.transaction_service import (  # noqa: E402
+    apply_transaction_filters,
+    local_date_for,
+    parse_transaction_filters,
+)
+
+USER_ID = "bench-user"
+CURRENCIES = ["IRR", "IRT", "USD", "EUR", "AED", "TRY"]
+TIMEZONES = ["Asia/Tehran", "UTC", "Europe/Istanbul"]
+CASES = {
+    "all": {},
+    "month": {"month": "3"},
+    "currency+min_amount": {"currency": "USD", "min_amount": "500000"},
+    "date range": {"date_from": "2025-03-01", "date_to": "2025-06-30"},
+    "search": {"search": "name-12"},
+}
+
+
+def populate(engine, rows: int) -> None:
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    names = [f"name-{i}" for i in range(5000)]
+    table = Transaction.__table__
+    batch = []
+    with engine.begin() as conn:
+        for _ in range(rows):
+            when = start + timedelta(seconds=rng.randrange(3 * 365 * 86400))
+            tz_name = rng.choice(TIMEZONES)
+            local = local_date_for(when, tz_name)
+            batch.append(
+                {
+                    "id": str(uuid.uuid4()),
+                    "created_by_user_id": USER_ID,
+                    "receiver_type": "individual",
+                    "receiver_name": rng.choice(names),
+                    "payer_type": "legal",
+                    "payer_name": rng.choice(names),
+                    "payment_method": "cash",
+                    "currency": rng.choice(CURRENCIES),
+                    "amount": rng.uniform(1, 1_000_000),
+                    "datetime_utc": when,
+                    "timezone": tz_name,
+                    "local_year": local.year,
+                    "local_month": local.month,
+                    "local_date": local,
+                }
+            )
+            if len(batch) == 10000:
+                conn.execute(insert(table), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(table), batch)
+
+
+def sql_summary(repo, params):
+    query = apply_transaction_filters(repo.base_for_user(USER_ID), params)
+    return (
+        repo.kpis(query),
+        repo.monthly_totals(query),
+        repo.totals_by_currency(query),
+    )
+
+
+def sql_page(repo, params):
+    query = apply_transaction_filters(repo.base_for_user(USER_ID), params)
+    return repo.page(query, "amount", "desc", 1, 10)
+
+
+def cache_page(cache, repo, db, filters):
+    # Mirrors the list handler: the cache picks the page's ids, then the rows are fetched by id.
+    total, page_ids = cache.page(USER_ID, db, filters, "amount", "desc", 1, 10)
+    return total, repo.by_ids_and_user(page_ids, USER_ID) if page_ids else []
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare SQL and columnar cache analytics.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    engine = init_engine(database_url)
+    init_db(engine)
+    run_migrations(engine)
+    started = time.perf_counter()
+    populate(engine, args.rows)
+    print(f"populated {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+    db = init_session(engine)()
+    repo = TransactionRepository(db)
+    cache = AnalyticsCache(4 * 1024 * 1024 * 1024)
+    load_ms = timed(lambda: cache.warm(USER_ID, engine), 1)
+    columns = cache._get_or_load(USER_ID, db)
+    print(f"cache load: {load_ms:.0f} ms, {columns.nbytes / 1024 / 1024:.1f} MiB")
+
+    print(f"{'case':<22}{'sql summary':>14}{'cache summary':>16}{'sql page':>12}{'cache page':>13}")
+    for name, params in CASES.items():
+        filters = parse_transaction_filters(params)
+        results = [
+            timed(lambda: sql_summary(repo, params), args.repeat),
+            timed(lambda: cache.summary(USER_ID, db, filters), args.repeat),
+            timed(lambda: sql_page(repo, params), args.repeat),
+            timed(lambda: cache_page(cache, repo, db, filters), args.repeat),
+        ]
+        print(f"{name:<22}" + "".join(f"{ms:>13.1f}ms" for ms in results))
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
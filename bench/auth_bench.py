@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("RATE_LIMIT_PER_MIN", "1000000000")
+os.environ.setdefault("ADMISSION_AUTH_LIMIT", "1000")
+os.environ.setdefault("SCHEDULER_ENABLED", "false")
+
+from internal.app import create_app  # noqa: E402
+
+CREDENTIALS = {"username": "admin", "password": "admin123"}
+
+
+def login(client) -> str:
+    resp = client.post("/api/v1/auth/login", json=CREDENTIALS)
+    assert resp.status_code == 200, resp.get_json()
+    return resp.get_json()["refresh_token"]
+
+
+def refresh(client, token: str) -> str:
+    resp = client.post("/api/v1/auth/refresh", json={"refresh_token": token})
+    assert resp.status_code == 200, resp.get_json()
+    return resp.get_json()["refresh_token"]
+
+
+def per_call_ms(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-request cost of login versus refresh.")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    client = create_app().test_client()
+    token = login(client)
+    token = refresh(client, token)
+
+    login_ms = per_call_ms(lambda: login(client), args.iterations)
+    state = {"token": token}
+
+    def rotate() -> None:
+        state["token"] = refresh(client, state["token"])
+
+    refresh_ms = per_call_ms(rotate, args.iterations)
+    print(f"{'endpoint':<10}{'ms/request':>12}{'requests/s':>12}")
+    for name, ms in [("login", login_ms), ("refresh", refresh_ms)]:
+        print(f"{name:<10}{ms:>12.2f}{1000 / ms:>12.0f}")
+    print(f"refresh is {login_ms / refresh_ms:.0f}x cheaper than login")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, func  # noqa: E402
+
+from internal.db import init_db, init_engine, init_session  # noqa: E402
+from internal.models import Transaction  # noqa: E402
+from internal.repositories.transaction_repo import TransactionRepository  # noqa: E402
+from internal.services.transaction_service import (  # noqa: E402
+    apply_transaction_filters,
+    parse_transaction_filters,
+)
+
+USER_ID = "bench-user"
+PARAMS = {"search": "ali", "currency": "USD", "date_from": "2026-01-01", "month": "3"}
+
+
+def legacy_filters(query, params):
+    # Query-based construction as it was before the repositories moved to lambda statements.
+    filters = parse_transaction_filters(params)
+    if "search" in filters:
+        pattern = f"%{filters['search']}%"
+        query = query.filter(
+            Transaction.receiver_name.ilike(pattern) | Transaction.payer_name.ilike(pattern)
+        )
+    if "date_from" in filters:
+        query = query.filter(Transaction.local_date >= filters["date_from"])
+    if "currency" in filters:
+        query = query.filter(Transaction.currency == filters["currency"])
+    if "month" in filters:
+        query = query.filter(Transaction.local_month == filters["month"])
+    return query
+
+
+def legacy_list(db):
+    query = db.query(Transaction).filter(Transaction.created_by_user_id == USER_ID)
+    query = legacy_filters(query, PARAMS)
+    sort_map = {
+        "receiver": Transaction.receiver_name,
+        "payer": Transaction.payer_name,
+        "amount": Transaction.amount,
+        "currency": Transaction.currency,
+        "date": Transaction.datetime_utc,
+    }
+    query = query.order_by(sort_map["date"].desc())
+    query.count()
+    query.limit(10).offset(0).all()
+
+
+def legacy_summary(db):
+    query = db.query(Transaction).filter(Transaction.created_by_user_id == USER_ID)
+    query = legacy_filters(query, PARAMS)
+    query.with_entities(func.coalesce(func.sum(Transaction.amount), 0.0)).scalar()
+    query.with_entities(func.coalesce(func.avg(Transaction.amount), 0.0)).scalar()
+    query.count()
+    query.with_entities(
+        Transaction.local_month, func.coalesce(func.sum(Transaction.amount), 0.0)
+    ).group_by(Transaction.local_month).order_by(Transaction.local_month).all()
+    query.with_entities(
+        Transaction.currency, func.coalesce(func.sum(Transaction.amount), 0.0)
+    ).group_by(Transaction.currency).all()
+
+
+def current_list(db):
+    repo = TransactionRepository(db)
+    query = apply_transaction_filters(repo.base_for_user(USER_ID), PARAMS)
+    repo.page(query, "date", "desc", 1, 10)
+
+
+def current_summary(db):
+    repo = TransactionRepository(db)
+    query = apply_transaction_filters(repo.base_for_user(USER_ID), PARAMS)
+    repo.kpis(query)
+    repo.monthly_totals(query)
+    repo.totals_by_currency(query)
+
+
+def capture_statements(engine, db, fn):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    fn(db)
+    event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+
+def per_call_us(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-request Python overhead of list/summary.")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    engine = init_engine("sqlite://")
+    init_db(engine)
+    db = init_session(engine)()
+    db.add(
+        Transaction(
+            created_by_user_id=USER_ID,
+            receiver_type="individual",
+            receiver_name="Ali",
+            payer_type="legal",
+            payer_name="Co",
+            payment_method="cash",
+            currency="USD",
+            amount=10.0,
+            datetime_utc=datetime(2026, 3, 1),
+            timezone="UTC",
+            local_year=2026,
+            local_month=3,
+            local_date=datetime(2026, 3, 1).date(),
+        )
+    )
+    db.commit()
+
+    print(f"{'path':<18}{'total':>10}{'db':>10}{'python':>10}  (us per request)")
+    for name, fn in [
+        ("legacy list", legacy_list),
+        ("current list", current_list),
+        ("legacy summary", legacy_summary),
+        ("current summary", current_summary),
+    ]:
+        fn(db)  # warm SQLAlchemy's compiled cache
+        statements = capture_statements(engine, db, fn)
+        total = per_call_us(lambda: fn(db), args.iterations)
+        raw = db.connection().connection.dbapi_connection
+
+        def replay():
+            cursor = raw.cursor()
+            for statement, parameters in statements:
+                cursor.execute(statement, parameters).fetchall()
+
+        db_only = per_call_us(replay, args.iterations)
+        print(f"{name:<18}{total:>10.1f}{db_only:>10.1f}{total - db_only:>10.1f}")
+        db.rollback()
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
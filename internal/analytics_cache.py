@@ -0,0 +1,370 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timezone
+
+from sqlalchemy import select
+
+from internal.models import Transaction
+from internal.services.transaction_service import local_date_for, parse_datetime_iso
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+EPOCH = date(1970, 1, 1)
+INITIAL_CAPACITY = 64
+MAX_AGE_SECONDS = 300
+LOAD_BATCH_SIZE = 10000
+LOAD_WORKERS = 2
+
+logger = logging.getLogger(__name__)
+
+
+class StringTable:
+    def __init__(self) -> None:
+        self.values: list[str] = []
+        self.codes: dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def ranks(self):
+        # Position of each code in sorted string order, so sorting by code rank sorts by text.
+        order = sorted(range(len(self.values)), key=self.values.__getitem__)
+        ranks = np.empty(len(self.values), dtype=np.int32)
+        ranks[order] = np.arange(len(order), dtype=np.int32)
+        return ranks
+
+    def matching(self, needle: str):
+        needle = needle.lower()
+        return np.fromiter(
+            (needle in value.lower() for value in self.values), dtype=bool, count=len(self.values)
+        )
+
+
+class UserColumns:
+    columns = {
+        "amount": "float64",
+        "ts": "int64",
+        "local_date": "int32",
+        "local_month": "int8",
+        "currency": "int32",
+        "receiver": "int32",
+        "payer": "int32",
+        "alive": "bool",
+    }
+
+    def __init__(self) -> None:
+        self.size = 0
+        self.dead = 0
+        self.ids: list[str] = []
+        self.positions: dict[str, int] = {}
+        self.strings = StringTable()
+        self.loaded_at = time.monotonic()
+        # Guards this user's arrays so scans for different users can run concurrently.
+        self.lock = threading.Lock()
+        for name, dtype in self.columns.items():
+            setattr(self, name, np.zeros(INITIAL_CAPACITY, dtype=dtype))
+
+    @property
+    def nbytes(self) -> int:
+        arrays = sum(getattr(self, name).nbytes for name in self.columns)
+        # Rough allowance for the id list, id index and interned strings.
+        return arrays + len(self.ids) * 120 + len(self.strings.values) * 80
+
+    def append(self, tx_id, amount, datetime_utc, local, currency, receiver, payer) -> None:
+        if tx_id in self.positions:
+            return
+        if self.size == len(self.amount):
+            self._grow(self.size * 2)
+        i = self.size
+        if datetime_utc.tzinfo is None:
+            datetime_utc = datetime_utc.replace(tzinfo=timezone.utc)
+        self.amount[i] = amount
+        self.ts[i] = int(datetime_utc.timestamp())
+        self.local_date[i] = (local - EPOCH).days
+        self.local_month[i] = local.month
+        self.currency[i] = self.strings.intern(currency)
+        self.receiver[i] = self.strings.intern(receiver)
+        self.payer[i] = self.strings.intern(payer)
+        self.alive[i] = True
+        self.ids.append(tx_id)
+        self.positions[tx_id] = i
+        self.size += 1
+
+    def remove(self, tx_id: str) -> None:
+        i = self.positions.pop(tx_id, None)
+        if i is not None:
+            self.alive[i] = False
+            self.dead += 1
+
+    def mask(self, filters: dict):
+        n = self.size
+        mask = self.alive[:n].copy()
+        if "search" in filters:
+            matches = self.strings.matching(filters["search"])
+            mask &= matches[self.receiver[:n]] | matches[self.payer[:n]]
+        if "date_from" in filters:
+            mask &= self.local_date[:n] >= (filters["date_from"] - EPOCH).days
+        if "date_to" in filters:
+            mask &= self.local_date[:n] <= (filters["date_to"] - EPOCH).days
+        if "currency" in filters:
+            code = self.strings.codes.get(filters["currency"])
+            if code is None:
+                return np.zeros(n, dtype=bool)
+            mask &= self.currency[:n] == code
+        if "min_amount" in filters:
+            mask &= self.amount[:n] >= filters["min_amount"]
+        if "month" in filters:
+            mask &= self.local_month[:n] == filters["month"]
+        return mask
+
+    def summary(self, filters: dict) -> dict:
+        idx = np.flatnonzero(self.mask(filters))
+        amounts = self.amount[idx]
+        count = len(idx)
+        total_amount = float(amounts.sum()) if count else 0.0
+        avg_amount = total_amount / count if count else 0.0
+        monthly_totals = np.bincount(self.local_month[idx], weights=amounts, minlength=13)
+        monthly = [
+            {"month": f"{month:02d}", "amount": float(monthly_totals[month])}
+            for month in range(1, 13)
+        ]
+        currency_codes = self.currency[idx]
+        currency_totals = np.bincount(currency_codes, weights=amounts)
+        by_currency = []
+        for code in np.unique(currency_codes):
+            amount = float(currency_totals[code])
+            percent = (amount / total_amount * 100) if total_amount else 0.0
+            by_currency.append(
+                {"currency": self.strings.values[code], "amount": amount, "percent": percent}
+            )
+        return {
+            "kpis": {"total_amount": total_amount, "avg_amount": avg_amount, "count": count},
+            "monthly": monthly,
+            "by_currency": by_currency,
+        }
+
+    def page(self, filters: dict, sort_by: str, sort_dir: str, page: int, per_page: int):
+        idx = np.flatnonzero(self.mask(filters))
+        total = len(idx)
+        start = max(page - 1, 0) * per_page
+        stop = min(start + per_page, total)
+        if start >= total:
+            return total, []
+        key = self._sort_key(sort_by)[idx]
+        if sort_dir == "desc":
+            key = -key
+        if stop < total:
+            # Only the rows up to the end of the requested page need to be ordered.
+            top = np.argpartition(key, stop - 1)[:stop]
+            order = top[np.argsort(key[top], kind="stable")]
+        else:
+            order = np.argsort(key, kind="stable")
+        return total, [self.ids[i] for i in idx[order[start:stop]]]
+
+    def _sort_key(self, sort_by: str):
+        n = self.size
+        if sort_by == "amount":
+            return self.amount[:n]
+        if sort_by in ("receiver", "payer", "currency"):
+            codes = {"receiver": self.receiver, "payer": self.payer, "currency": self.currency}
+            return self.strings.ranks()[codes[sort_by][:n]].astype(np.int64)
+        return self.ts[:n]
+
+    def compact(self) -> None:
+        keep = np.flatnonzero(self.alive[: self.size])
+        for name in self.columns:
+            column = getattr(self, name)
+            compacted = np.zeros(max(len(keep) * 2, INITIAL_CAPACITY), dtype=column.dtype)
+            compacted[: len(keep)] = column[keep]
+            setattr(self, name, compacted)
+        self.ids = [self.ids[i] for i in keep]
+        self.positions = {tx_id: i for i, tx_id in enumerate(self.ids)}
+        self.size = len(keep)
+        self.dead = 0
+
+    def _grow(self, capacity: int) -> None:
+        for name in self.columns:
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[: self.size] = column[: self.size]
+            setattr(self, name, grown)
+
+
+class AnalyticsCache:
+    def __init__(self, budget_bytes: int) -> None:
+        self.budget_bytes = budget_bytes
+        self._lock = threading.RLock()
+        self._users: OrderedDict[str, UserColumns] = OrderedDict()
+        self._pending: dict[str, list[tuple[str, dict]]] = {}
+        self._loading: set[str] = set()
+        self._loader = ThreadPoolExecutor(LOAD_WORKERS, thread_name_prefix="analytics-load")
+        # Users whose columns did not fit in the budget, served from SQL until the mark expires.
+        self._oversized: dict[str, float] = {}
+
+    def summary(self, user_id: str, db, filters: dict) -> dict | None:
+        columns = self._get_or_load(user_id, db)
+        if columns is None:
+            return None
+        with columns.lock:
+            return columns.summary(filters)
+
+    def page(self, user_id: str, db, filters: dict, sort_by, sort_dir, page, per_page):
+        columns = self._get_or_load(user_id, db)
+        if columns is None:
+            return None
+        with columns.lock:
+            return columns.page(filters, sort_by, sort_dir, page, per_page)
+
+    def _get_or_load(self, user_id: str, db) -> UserColumns | None:
+        with self._lock:
+            now = time.monotonic()
+            marked_at = self._oversized.get(user_id)
+            if marked_at is not None and now - marked_at < MAX_AGE_SECONDS:
+                return None
+            columns = self._users.get(user_id)
+            if columns is not None and now - columns.loaded_at < MAX_AGE_SECONDS:
+                self._users.move_to_end(user_id)
+                return columns
+            if user_id in self._loading:
+                return None
+            self._users.pop(user_id, None)
+            self._oversized.pop(user_id, None)
+            self._loading.add(user_id)
+            self._pending[user_id] = []
+        # A cold load can take longer than the request deadline, so it runs in the background
+        # without one; until it finishes, requests for this user are answered from SQL.
+        self._loader.submit(self.warm, user_id, db.get_bind())
+        return None
+
+    def warm(self, user_id: str, engine) -> UserColumns | None:
+        with self._lock:
+            self._loading.add(user_id)
+            self._pending.setdefault(user_id, [])
+        columns = None
+        loaded = False
+        try:
+            with engine.connect() as conn:
+                columns = self._load(user_id, conn)
+            loaded = True
+        except Exception:
+            logger.exception("analytics cache load failed for user %s", user_id)
+        finally:
+            with self._lock:
+                pending = self._pending.pop(user_id, [])
+                if loaded and columns is None:
+                    self._oversized[user_id] = time.monotonic()
+                elif loaded:
+                    self._store(user_id, columns, pending)
+                self._loading.discard(user_id)
+        return columns
+
+    def _store(self, user_id: str, columns: UserColumns, pending) -> None:
+        # Events that arrived while the snapshot was loading may or may not be in it.
+        complete = True
+        for kind, event in pending:
+            complete = self._apply(columns, kind, event) and complete
+        if complete:
+            self._users[user_id] = columns
+            self._evict()
+
+    def handle_event(self, user_id: str | None, event: dict) -> None:
+        kind = event.get("type")
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+                for pending in self._pending.values():
+                    pending.append((kind, event))
+                return
+            if user_id in self._pending:
+                self._pending[user_id].append((kind, event))
+                return
+            columns = self._users.get(user_id)
+            if columns is None:
+                return
+        # Apply outside the cache-wide lock so a long scan of this user only delays this user.
+        with columns.lock:
+            complete = self._apply(columns, kind, event)
+            if complete and columns.dead > columns.size // 2:
+                columns.compact()
+        with self._lock:
+            if not complete:
+                if self._users.get(user_id) is columns:
+                    del self._users[user_id]
+                return
+            self._evict()
+
+    def _apply(self, columns: UserColumns, kind: str, event: dict) -> bool:
+        if kind == "transaction.created":
+            tx = event["transaction"]
+            datetime_utc = parse_datetime_iso(tx["datetime_iso"])
+            columns.append(
+                tx["id"],
+                tx["amount"],
+                datetime_utc,
+                local_date_for(datetime_utc, tx["timezone"]),
+                tx["currency"],
+                tx["receiver_name"],
+                tx["payer_name"],
+            )
+        elif kind == "transaction.deleted":
+            columns.remove(event["transaction_id"])
+        elif kind == "transaction.bulk_deleted":
+            if "transaction_ids" not in event:
+                return False
+            for tx_id in event["transaction_ids"]:
+                columns.remove(tx_id)
+        elif kind == "resync":
+            return False
+        return True
+
+    def _load(self, user_id: str, conn) -> UserColumns | None:
+        columns = UserColumns()
+        stmt = select(
+            Transaction.id,
+            Transaction.amount,
+            Transaction.datetime_utc,
+            Transaction.local_date,
+            Transaction.timezone,
+            Transaction.currency,
+            Transaction.receiver_name,
+            Transaction.payer_name,
+        ).where(Transaction.created_by_user_id == user_id)
+        result = conn.execute(stmt.execution_options(yield_per=LOAD_BATCH_SIZE))
+        for rows in result.partitions():
+            for tx_id, amount, datetime_utc, local, tz_name, currency, receiver, payer in rows:
+                if local is None:
+                    local = local_date_for(datetime_utc, tz_name)
+                columns.append(tx_id, amount, datetime_utc, local, currency, receiver, payer)
+            if columns.nbytes > self.budget_bytes:
+                # Stop early: this user can never be cached, so the rest would be wasted work.
+                result.close()
+                return None
+        return columns
+
+    def _evict(self) -> None:
+        total = sum(columns.nbytes for columns in self._users.values())
+        while total > self.budget_bytes and self._users:
+            _, evicted = self._users.popitem(last=False)
+            total -= evicted.nbytes
+
+
+def init_analytics_cache(budget_mb: int, events) -> AnalyticsCache | None:
+    if budget_mb <= 0:
+        return None
+    if np is None:
+        logger.warning("ANALYTICS_CACHE_MB is set but numpy is not installed; cache disabled")
+        return None
+    cache = AnalyticsCache(budget_mb * 1024 * 1024)
+    events.add_listener(cache.handle_event)
+    return cache
@@ -1,13 +1,20 @@
 from flask import Flask, g
 from flask_cors import CORS
 
+from internal.analytics_cache import init_analytics_cache
 from internal.config import Config
 from internal.db import init_db, init_engine, init_session
+from internal.deadlines import install_statement_timeouts
+from internal.events import EventBroker, init_event_backend
 from internal.http.middleware import register_middleware
 from internal.http.routes import register_routes
+from internal.metrics import Metrics
+from internal.migrations import run_migrations
 from internal.rate_limiter import RateLimiter
 from internal.repositories.user_repo import UserRepository
+from internal.scheduler import init_scheduler
 from internal.services.user_service import seed_users
+from internal.sharding import init_shard_router
 
 
 def create_app() -> Flask:
@@ -19,16 +26,29 @@ def create_app() -> Flask:
     engine = init_engine(cfg.db_url)
     SessionLocal = init_session(engine)
     init_db(engine)
+    run_migrations(engine)
+    install_statement_timeouts(engine)
 
     rate_limiter = RateLimiter(cfg.rate_limit_per_minute)
+    metrics = Metrics()
+    events = EventBroker(init_event_backend(cfg.events_backend, engine))
+    analytics = init_analytics_cache(cfg.analytics_cache_mb, events)
 
-    def get_db():
-        if "db" not in g:
-            g.db = SessionLocal()
-        return g.db
+    shard_router = init_shard_router(cfg, engine, SessionLocal)
 
-    register_middleware(app, get_db, rate_limiter, cfg)
-    register_routes(app, cfg, get_db)
+    def get_db(user_id: str | None = None):
+        if user_id is None or shard_router is None:
+            if "db" not in g:
+                g.db = SessionLocal()
+            return g.db
+        shard_dbs = g.setdefault("shard_dbs", {})
+        index = shard_router.shard_for(user_id)
+        if index not in shard_dbs:
+            shard_dbs[index] = shard_router.sessions[index]()
+        return shard_dbs[index]
+
+    register_middleware(app, get_db, rate_limiter, cfg, metrics)
+    register_routes(app, cfg, get_db, events, metrics, analytics)
 
     with app.app_context():
         db = get_db()
@@ -36,4 +56,9 @@ def create_app() -> Flask:
         seed_users(repo)
         db.close()
 
+    if cfg.scheduler_enabled:
+        shard_engines = shard_router.engines if shard_router else []
+        scheduler = init_scheduler(engine, shard_engines, rate_limiter, metrics)
+        scheduler.start()
+
     return app
@@ -12,8 +12,13 @@ class Config:
             "DATABASE_URL",
             "sqlite:///./avagostar.db",
         )
+        self.shard_db_urls = [
+            url.strip() for url in os.getenv("SHARD_DATABASE_URLS", "").split(",") if url.strip()
+        ]
+        self.shard_strategy = os.getenv("SHARD_STRATEGY", "hash")
         self.jwt_secret = os.getenv("JWT_SECRET", "change-me")
         self.jwt_expires_in = os.getenv("JWT_EXPIRES_IN", "1h")
+        self.refresh_token_expires_in = os.getenv("REFRESH_TOKEN_EXPIRES_IN", "720h")
         allowed_origins = [
             origin.strip()
             for origin in os.getenv("CORS_ALLOWED_ORIGINS", "*").split(",")
@@ -25,6 +30,13 @@ class Config:
             self.allowed_origins = allowed_origins
         self.rate_limit_per_minute = int(os.getenv("RATE_LIMIT_PER_MIN", "30"))
         self.request_timeout = os.getenv("REQUEST_TIMEOUT", "5s")
+        self.admission_heavy_limit = int(os.getenv("ADMISSION_HEAVY_LIMIT", "4"))
+        self.admission_auth_limit = int(os.getenv("ADMISSION_AUTH_LIMIT", "4"))
+        self.admission_queue_size = int(os.getenv("ADMISSION_QUEUE_SIZE", "16"))
+        self.admission_queue_timeout = os.getenv("ADMISSION_QUEUE_TIMEOUT", "1s")
+        self.events_backend = os.getenv("EVENTS_BACKEND", "local")
+        self.analytics_cache_mb = int(os.getenv("ANALYTICS_CACHE_MB", "0"))
+        self.scheduler_enabled = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
         self.password_min_len = 8 if self.env == "prod" else 4
         self.enable_dev_reset_codes = self.env != "prod"
 
@@ -32,11 +44,25 @@ class Config:
             raise ValueError("JWT_SECRET is required")
 
     def jwt_expiry_seconds(self) -> int:
-        raw = self.jwt_expires_in
-        if raw.endswith("h"):
-            return int(float(raw[:-1]) * 3600)
-        if raw.endswith("m"):
-            return int(float(raw[:-1]) * 60)
-        if raw.endswith("s"):
-            return int(float(raw[:-1]))
-        return int(raw)
+        return int(parse_duration(self.jwt_expires_in))
+
+    def refresh_token_expiry_seconds(self) -> int:
+        return int(parse_duration(self.refresh_token_expires_in))
+
+    def request_timeout_seconds(self) -> float:
+        return parse_duration(self.request_timeout)
+
+    def admission_queue_timeout_seconds(self) -> float:
+        return parse_duration(self.admission_queue_timeout)
+
+
+def parse_duration(raw: str) -> float:
+    if raw.endswith("h"):
+        return float(raw[:-1]) * 3600
+    if raw.endswith("ms"):
+        return float(raw[:-2]) / 1000
+    if raw.endswith("m"):
+        return float(raw[:-1]) * 60
+    if raw.endswith("s"):
+        return float(raw[:-1])
+    return float(raw)
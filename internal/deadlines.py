@@ -0,0 +1,89 @@
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+SQLITE_PROGRESS_STEPS = 10000
+
+current_deadline: ContextVar[float | None] = ContextVar("current_deadline", default=None)
+
+
+def remaining_seconds() -> float | None:
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def expired() -> bool:
+    remaining = remaining_seconds()
+    return remaining is not None and remaining <= 0
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def install_statement_timeouts(engine) -> None:
+    dialect = engine.dialect.name
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def apply_deadline(conn, cursor, statement, parameters, context, executemany) -> None:
+        deadline = current_deadline.get()
+        if deadline is None:
+            return
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("request deadline exceeded")
+        if dialect == "postgresql":
+            # Recomputed per statement so a request's statements share one budget.
+            cursor.execute(f"SET LOCAL statement_timeout = {max(int(remaining * 1000), 1)}")
+
+    if dialect == "sqlite":
+
+        @event.listens_for(engine, "begin")
+        def interrupt_at_deadline(conn) -> None:
+            deadline = current_deadline.get()
+            dbapi_conn = conn.connection.dbapi_connection
+            if deadline is None:
+                dbapi_conn.set_progress_handler(None, 0)
+            else:
+                # A non-zero return interrupts the running statement with OperationalError.
+                dbapi_conn.set_progress_handler(
+                    lambda: int(time.monotonic() > deadline), SQLITE_PROGRESS_STEPS
+                )
+
+        @event.listens_for(engine, "checkin")
+        def clear_deadline(dbapi_conn, connection_record) -> None:
+            dbapi_conn.set_progress_handler(None, 0)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit: int, max_queue: int) -> None:
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float) -> bool:
+        with self._cond:
+            if self.active < self.limit:
+                self.active += 1
+                return True
+            if self.waiting >= self.max_queue:
+                return False
+            self.waiting += 1
+            try:
+                acquired = self._cond.wait_for(lambda: self.active < self.limit, timeout)
+                if acquired:
+                    self.active += 1
+                return acquired
+            finally:
+                self.waiting -= 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
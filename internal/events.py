@@ -0,0 +1,201 @@
+import json
+import logging
+import queue
+import select
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 100
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more.
+MAX_NOTIFY_BYTES = 7900
+LISTEN_RETRY_SECONDS = 1
+LISTEN_RETRY_MAX_SECONDS = 30
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    def __init__(self, user_id: str, maxsize: int = SUBSCRIBER_QUEUE_SIZE) -> None:
+        self.user_id = user_id
+        self.queue: queue.Queue[dict] = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def push(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # The client fell behind; drop the backlog and tell it to refetch everything.
+            self.overflowed = True
+
+    def get(self, timeout: float) -> dict | None:
+        if self.overflowed:
+            self.overflowed = False
+            with self.queue.mutex:
+                self.queue.queue.clear()
+            return {"type": "resync"}
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LocalBackend:
+    def start(self, deliver, resync_all) -> None:
+        self.deliver = deliver
+
+    def publish(self, user_id: str, event: dict) -> None:
+        self.deliver(user_id, event)
+
+    def close(self) -> None:
+        pass
+
+
+class PostgresBackend:
+    channel = "transaction_events"
+
+    def __init__(self, engine) -> None:
+        self.engine = engine
+        self.origin = str(uuid.uuid4())
+        self._stop = threading.Event()
+
+    def start(self, deliver, resync_all) -> None:
+        self.deliver = deliver
+        self.resync_all = resync_all
+        thread = threading.Thread(target=self._listen, name="event-listener", daemon=True)
+        thread.start()
+
+    def publish(self, user_id: str, event: dict) -> None:
+        # Deliver locally right away; the notification is ignored by this worker's listener.
+        self.deliver(user_id, event)
+        payload = json.dumps(
+            {"origin": self.origin, "user_id": user_id, "event": event}, default=str
+        )
+        if len(payload.encode("utf-8")) >= MAX_NOTIFY_BYTES:
+            # Too large to notify; other workers drop what they know about the user instead.
+            payload = json.dumps(
+                {"origin": self.origin, "user_id": user_id, "event": {"type": "resync"}}
+            )
+        conn = self.engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        self._stop.set()
+
+    def _listen(self) -> None:
+        retry = LISTEN_RETRY_SECONDS
+        connected_before = False
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self._listen_once(resync=connected_before)
+            except Exception:
+                logger.exception("event listener connection lost")
+            connected_before = True
+            if time.monotonic() - started > LISTEN_RETRY_MAX_SECONDS:
+                retry = LISTEN_RETRY_SECONDS
+            self._stop.wait(retry)
+            retry = min(retry * 2, LISTEN_RETRY_MAX_SECONDS)
+
+    def _listen_once(self, resync: bool) -> None:
+        conn = self.engine.raw_connection()
+        try:
+            dbapi_conn = conn.dbapi_connection
+            dbapi_conn.autocommit = True
+            dbapi_conn.cursor().execute(f"LISTEN {self.channel}")
+            if resync:
+                # Notifications sent while the connection was down are lost.
+                self.resync_all()
+            while not self._stop.is_set():
+                if select.select([dbapi_conn], [], [], 5) == ([], [], []):
+                    continue
+                dbapi_conn.poll()
+                while dbapi_conn.notifies:
+                    notify = dbapi_conn.notifies.pop(0)
+                    message = json.loads(notify.payload)
+                    if message.get("origin") == self.origin:
+                        continue
+                    self.deliver(message["user_id"], message["event"])
+        finally:
+            # This connection is in autocommit mode and still listening; never hand it back
+            # to the pool, where a request transaction could pick it up.
+            conn.invalidate()
+
+
+class EventBroker:
+    def __init__(self, backend=None) -> None:
+        self.backend = backend or LocalBackend()
+        self._lock = threading.Lock()
+        self._subscribers: dict[str, set[Subscription]] = defaultdict(set)
+        self._listeners = []
+        self.backend.start(self._deliver, self._resync_all)
+
+    def add_listener(self, callback) -> None:
+        self._listeners.append(callback)
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id: str, event: dict) -> None:
+        # Events are published after the write has committed; never fail the request over them.
+        try:
+            self.backend.publish(user_id, event)
+        except Exception:
+            logger.exception("failed to publish %s event", event.get("type"))
+
+    def close(self) -> None:
+        self.backend.close()
+
+    def _deliver(self, user_id: str, event: dict) -> None:
+        for callback in self._listeners:
+            try:
+                callback(user_id, event)
+            except Exception:
+                logger.exception("event listener failed for %s", event.get("type"))
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.push(event)
+
+    def _resync_all(self) -> None:
+        # A user id of None tells listeners that events for any user may have been missed.
+        for callback in self._listeners:
+            try:
+                callback(None, {"type": "resync"})
+            except Exception:
+                logger.exception("event listener failed for resync")
+        with self._lock:
+            subscribers = [s for group in self._subscribers.values() for s in group]
+        for subscription in subscribers:
+            subscription.push({"type": "resync"})
+
+
+def init_event_backend(name: str, engine):
+    if name == "local":
+        return LocalBackend()
+    if name == "postgres":
+        return PostgresBackend(engine)
+    raise ValueError(f"unknown EVENTS_BACKEND: {name}")
+
+
+def format_sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
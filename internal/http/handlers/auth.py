@@ -3,16 +3,33 @@ from datetime import datetime, timedelta, timezone
 from flask import jsonify, request
 
 from internal.http.responses import error_response, validate_required
+from internal.repositories.refresh_token_repo import RefreshTokenRepository
 from internal.repositories.user_repo import UserRepository
 from internal.services.auth_service import (
+    as_utc,
     generate_reset_code,
     generate_token,
     hash_password,
+    hash_refresh_token,
+    issue_refresh_token,
     verify_password,
 )
 
 
 def register_auth_routes(app, cfg, get_db):
+    def token_response(user, refresh_token: str):
+        token, expires_in = generate_token(user, cfg.jwt_secret, cfg.jwt_expiry_seconds())
+        return jsonify(
+            {
+                "access_token": token,
+                "token_type": "Bearer",
+                "expires_in": expires_in,
+                "refresh_token": refresh_token,
+                "refresh_expires_in": cfg.refresh_token_expiry_seconds(),
+                "user": {"id": user.id, "username": user.username, "role": user.role},
+            }
+        )
+
     @app.post("/api/v1/auth/login")
     def login():
         data = request.get_json(silent=True) or {}
@@ -24,15 +41,66 @@ def register_auth_routes(app, cfg, get_db):
         user = repo.get_by_username(data["username"])
         if not user or not verify_password(data["password"], user.password_hash):
             return error_response(401, "UNAUTHORIZED", "invalid credentials")
-        token, expires_in = generate_token(user, cfg.jwt_secret, cfg.jwt_expiry_seconds())
-        return jsonify(
-            {
-                "access_token": token,
-                "token_type": "Bearer",
-                "expires_in": expires_in,
-                "user": {"id": user.id, "username": user.username, "role": user.role},
-            }
+        tokens = RefreshTokenRepository(db)
+        refresh_token, _ = issue_refresh_token(tokens, user.id, cfg.refresh_token_expiry_seconds())
+        tokens.commit()
+        return token_response(user, refresh_token)
+
+    @app.post("/api/v1/auth/refresh")
+    def refresh():
+        data = request.get_json(silent=True) or {}
+        validation = validate_required(data, ["refresh_token"])
+        if validation:
+            return validation
+        if not isinstance(data["refresh_token"], str):
+            return error_response(400, "VALIDATION_ERROR", "invalid request", ["refresh_token"])
+        db = get_db()
+        tokens = RefreshTokenRepository(db)
+        current = tokens.get_by_hash(hash_refresh_token(data["refresh_token"]))
+        if not current:
+            return error_response(401, "UNAUTHORIZED", "invalid refresh token")
+        now = datetime.now(timezone.utc)
+        if current.revoked_at is not None:
+            # A rotated token was presented again, so it may have leaked; end the whole session.
+            tokens.revoke_family(current.family_id, now)
+            tokens.commit()
+            return error_response(401, "UNAUTHORIZED", "invalid refresh token")
+        if now > as_utc(current.expires_at):
+            return error_response(401, "UNAUTHORIZED", "refresh token expired")
+        user = UserRepository(db).get_by_id(current.user_id)
+        if not user:
+            return error_response(401, "UNAUTHORIZED", "invalid refresh token")
+        refresh_token, replacement = issue_refresh_token(
+            tokens,
+            user.id,
+            cfg.refresh_token_expiry_seconds(),
+            family_id=current.family_id,
         )
+        family_id = current.family_id
+        if not tokens.revoke_if_active(current.id, now, replacement.id):
+            # Lost a race with another refresh of the same token: treat it as reuse.
+            db.rollback()
+            tokens.revoke_family(family_id, now)
+            tokens.commit()
+            return error_response(401, "UNAUTHORIZED", "invalid refresh token")
+        tokens.commit()
+        return token_response(user, refresh_token)
+
+    @app.post("/api/v1/auth/logout")
+    def logout():
+        data = request.get_json(silent=True) or {}
+        validation = validate_required(data, ["refresh_token"])
+        if validation:
+            return validation
+        if not isinstance(data["refresh_token"], str):
+            return error_response(400, "VALIDATION_ERROR", "invalid request", ["refresh_token"])
+        db = get_db()
+        tokens = RefreshTokenRepository(db)
+        current = tokens.get_by_hash(hash_refresh_token(data["refresh_token"]))
+        if current:
+            tokens.revoke_family(current.family_id, datetime.now(timezone.utc))
+            tokens.commit()
+        return jsonify({"message": "logged out"})
 
     @app.post("/api/v1/auth/forgot")
     def forgot_password():
@@ -74,7 +142,7 @@ def register_auth_routes(app, cfg, get_db):
             return error_response(404, "NOT_FOUND", "user not found")
         if not user.reset_code_hash or not user.reset_code_expires_at:
             return error_response(400, "VALIDATION_ERROR", "reset code not requested")
-        if datetime.now(timezone.utc) > user.reset_code_expires_at:
+        if datetime.now(timezone.utc) > as_utc(user.reset_code_expires_at):
             return error_response(400, "VALIDATION_ERROR", "reset code expired")
         if not verify_password(data["code"], user.reset_code_hash):
             return error_response(400, "VALIDATION_ERROR", "invalid reset code")
@@ -82,5 +150,6 @@ def register_auth_routes(app, cfg, get_db):
         user.reset_code_hash = None
         user.reset_code_expires_at = None
         user.updated_at = datetime.now(timezone.utc)
+        RefreshTokenRepository(db).revoke_for_user(user.id, datetime.now(timezone.utc))
         repo.commit()
         return jsonify({"message": "password updated"})
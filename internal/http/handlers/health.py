@@ -1,7 +1,11 @@
 from flask import jsonify
 
 
-def register_health_routes(app):
+def register_health_routes(app, metrics):
     @app.get("/healthz")
     def health():
         return jsonify({"ok": True})
+
+    @app.get("/metrics")
+    def metrics_snapshot():
+        return jsonify(metrics.snapshot())
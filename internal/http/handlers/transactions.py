@@ -1,13 +1,28 @@
-from flask import jsonify, request, g
+import time
+from datetime import datetime, timezone
 
+from flask import Response, jsonify, request, g, stream_with_context
+
+from internal.events import HEARTBEAT_SECONDS, format_sse
 from internal.http.middleware import require_auth
 from internal.http.responses import error_response, validate_required
 from internal.models import Transaction
 from internal.repositories.transaction_repo import TransactionRepository
 from internal.services.transaction_service import (
+    MAX_EVENT_IDS,
+    TRANSACTION_FILTER_KEYS,
     apply_transaction_filters,
+    fill_timeseries,
+    parse_id_list,
+    parse_transaction_filters,
     parse_datetime_iso,
+    resolve_timezone,
+    set_local_date_fields,
+    timeseries_range,
+    transaction_created_event,
+    transaction_deleted_event,
     transaction_to_response,
+    transactions_bulk_deleted_event,
 )
 
 
@@ -17,7 +32,7 @@ ALLOWED_PAYMENT_METHODS = {"cash", "account"}
 ALLOWED_CURRENCIES = {"IRR", "IRT", "USD", "EUR", "AED", "TRY"}
 
 
-def register_transaction_routes(app, cfg, get_db):
+def register_transaction_routes(app, cfg, get_db, events, analytics):
     @app.post("/api/v1/transactions")
     @require_auth(cfg)
     def create_transaction():
@@ -53,7 +68,9 @@ def register_transaction_routes(app, cfg, get_db):
         parsed_time = parse_datetime_iso(data["datetime_iso"])
         if not parsed_time:
             return error_response(400, "VALIDATION_ERROR", "datetime_iso must be RFC3339")
-        db = get_db()
+        if not resolve_timezone(data["timezone"]):
+            return error_response(400, "VALIDATION_ERROR", "invalid timezone")
+        db = get_db(g.user_id)
         repo = TransactionRepository(db)
         tx = Transaction(
             created_by_user_id=g.user_id,
@@ -70,40 +87,43 @@ def register_transaction_routes(app, cfg, get_db):
             datetime_utc=parsed_time,
             timezone=data["timezone"],
         )
+        set_local_date_fields(tx)
         repo.add(tx)
         repo.commit()
         repo.refresh(tx)
+        events.publish(g.user_id, transaction_created_event(tx))
         return jsonify(transaction_to_response(tx)), 201
 
     @app.get("/api/v1/transactions")
     @require_auth(cfg)
     def list_transactions():
         params = request.args
-        db = get_db()
+        db = get_db(g.user_id)
         repo = TransactionRepository(db)
-        query = repo.base_for_user(g.user_id)
-        try:
-            query = apply_transaction_filters(query, params)
-        except ValueError as exc:
-            return error_response(400, "VALIDATION_ERROR", str(exc))
         sort_by = params.get("sort_by", "date")
         sort_dir = params.get("sort_dir", "desc").lower()
-        sort_map = {
-            "receiver": Transaction.receiver_name,
-            "payer": Transaction.payer_name,
-            "amount": Transaction.amount,
-            "currency": Transaction.currency,
-            "date": Transaction.datetime_utc,
-        }
-        sort_column = sort_map.get(sort_by, Transaction.datetime_utc)
-        if sort_dir == "desc":
-            query = query.order_by(sort_column.desc())
-        else:
-            query = query.order_by(sort_column.asc())
         page = int(params.get("page", 1))
         per_page = int(params.get("per_page", 10))
-        total = repo.count(query)
-        items = query.limit(per_page).offset((page - 1) * per_page).all()
+        cached = None
+        if analytics is not None:
+            try:
+                filters = parse_transaction_filters(params)
+            except ValueError as exc:
+                return error_response(400, "VALIDATION_ERROR", str(exc))
+            cached = analytics.page(g.user_id, db, filters, sort_by, sort_dir, page, per_page)
+        if cached is not None:
+            total, page_ids = cached
+            found = {}
+            if page_ids:
+                found = {tx.id: tx for tx in repo.by_ids_and_user(page_ids, g.user_id)}
+            items = [found[tx_id] for tx_id in page_ids if tx_id in found]
+        else:
+            query = repo.base_for_user(g.user_id)
+            try:
+                query = apply_transaction_filters(query, params)
+            except ValueError as exc:
+                return error_response(400, "VALIDATION_ERROR", str(exc))
+            total, items = repo.page(query, sort_by, sort_dir, page, per_page)
         data = [transaction_to_response(tx) for tx in items]
         total_pages = (total + per_page - 1) // per_page
         return jsonify(
@@ -122,19 +142,25 @@ def register_transaction_routes(app, cfg, get_db):
     @require_auth(cfg)
     def transactions_summary():
         params = request.args
-        db = get_db()
+        db = get_db(g.user_id)
+        if analytics is not None:
+            try:
+                filters = parse_transaction_filters(params)
+            except ValueError as exc:
+                return error_response(400, "VALIDATION_ERROR", str(exc))
+            cached = analytics.summary(g.user_id, db, filters)
+            if cached is not None:
+                return jsonify(cached)
         repo = TransactionRepository(db)
         base_query = repo.base_for_user(g.user_id)
         try:
             base_query = apply_transaction_filters(base_query, params)
         except ValueError as exc:
             return error_response(400, "VALIDATION_ERROR", str(exc))
-        total_amount = repo.total_amount(base_query)
-        avg_amount = repo.avg_amount(base_query)
-        count = repo.count(base_query)
+        total_amount, avg_amount, count = repo.kpis(base_query)
 
         monthly_rows = repo.monthly_totals(base_query)
-        monthly_map = {month: amount for month, amount in monthly_rows}
+        monthly_map = {f"{month:02d}": amount for month, amount in monthly_rows if month}
         monthly = [
             {"month": f"{i:02d}", "amount": monthly_map.get(f"{i:02d}", 0.0)}
             for i in range(1, 13)
@@ -154,10 +180,130 @@ def register_transaction_routes(app, cfg, get_db):
             }
         )
 
+    @app.get("/api/v1/transactions/timeseries")
+    @require_auth(cfg)
+    def transactions_timeseries():
+        params = request.args
+        try:
+            granularity, date_from, date_to = timeseries_range(
+                params, datetime.now(timezone.utc).date()
+            )
+        except ValueError as exc:
+            return error_response(400, "VALIDATION_ERROR", str(exc))
+        filter_params = params.to_dict()
+        filter_params["date_from"] = date_from.isoformat()
+        filter_params["date_to"] = date_to.isoformat()
+        db = get_db(g.user_id)
+        repo = TransactionRepository(db)
+        query = repo.base_for_user(g.user_id)
+        try:
+            query = apply_transaction_filters(query, filter_params)
+        except ValueError as exc:
+            return error_response(400, "VALIDATION_ERROR", str(exc))
+        rows = repo.timeseries_totals(query, granularity)
+        return jsonify(
+            {
+                "granularity": granularity,
+                "date_from": date_from.isoformat(),
+                "date_to": date_to.isoformat(),
+                "buckets": fill_timeseries(rows, date_from, date_to, granularity),
+            }
+        )
+
+    @app.get("/api/v1/transactions/events")
+    @require_auth(cfg, allow_query_token=True)
+    def transaction_events():
+        subscription = events.subscribe(g.user_id)
+        expires_at = g.token_expires_at
+
+        def stream():
+            try:
+                yield format_sse({"type": "ready"})
+                while True:
+                    timeout = HEARTBEAT_SECONDS
+                    if expires_at is not None:
+                        remaining = expires_at - time.time()
+                        if remaining <= 0:
+                            # The stream must not outlive the token that opened it.
+                            yield format_sse({"type": "token_expired"})
+                            return
+                        timeout = min(timeout, remaining)
+                    event = subscription.get(timeout=timeout)
+                    if event is None:
+                        yield ": heartbeat\n\n"
+                        continue
+                    yield format_sse(event)
+            finally:
+                events.unsubscribe(subscription)
+
+        return Response(
+            stream_with_context(stream()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.post("/api/v1/transactions/batch-get")
+    @require_auth(cfg)
+    def transactions_batch_get():
+        data = request.get_json(silent=True) or {}
+        try:
+            tx_ids = parse_id_list(data.get("ids"))
+        except ValueError as exc:
+            return error_response(400, "VALIDATION_ERROR", str(exc))
+        db = get_db(g.user_id)
+        repo = TransactionRepository(db)
+        found = {tx.id: tx for tx in repo.by_ids_and_user(tx_ids, g.user_id)}
+        return jsonify(
+            {
+                "data": [
+                    transaction_to_response(found[tx_id]) for tx_id in tx_ids if tx_id in found
+                ],
+                "missing": [tx_id for tx_id in tx_ids if tx_id not in found],
+            }
+        )
+
+    @app.post("/api/v1/transactions/bulk-delete")
+    @require_auth(cfg)
+    def transactions_bulk_delete():
+        data = request.get_json(silent=True) or {}
+        if ("ids" in data) == ("filters" in data):
+            return error_response(400, "VALIDATION_ERROR", "provide either ids or filters")
+        db = get_db(g.user_id)
+        repo = TransactionRepository(db)
+        query = repo.delete_base_for_user(g.user_id)
+        if "ids" in data:
+            try:
+                tx_ids = parse_id_list(data["ids"])
+            except ValueError as exc:
+                return error_response(400, "VALIDATION_ERROR", str(exc))
+            query = repo.filter_ids(query, tx_ids)
+            returning = len(tx_ids) <= MAX_EVENT_IDS
+        else:
+            filters = data["filters"]
+            if not isinstance(filters, dict):
+                return error_response(400, "VALIDATION_ERROR", "filters must be an object")
+            unknown = sorted(set(filters) - set(TRANSACTION_FILTER_KEYS))
+            if unknown:
+                return error_response(400, "VALIDATION_ERROR", "unknown filters", unknown)
+            if not any(filters.get(key) for key in TRANSACTION_FILTER_KEYS):
+                return error_response(400, "VALIDATION_ERROR", "filters must not be empty")
+            try:
+                query = apply_transaction_filters(query, filters)
+            except ValueError as exc:
+                return error_response(400, "VALIDATION_ERROR", str(exc))
+            # Only pull deleted rows back when they are few enough to describe in the event.
+            matching = apply_transaction_filters(repo.base_for_user(g.user_id), filters)
+            returning = repo.count(matching) <= MAX_EVENT_IDS
+        count, rows = repo.delete_matching(query, returning)
+        repo.commit()
+        if count:
+            events.publish(g.user_id, transactions_bulk_deleted_event(count, rows))
+        return jsonify({"deleted": count})
+
     @app.get("/api/v1/transactions/<tx_id>")
     @require_auth(cfg)
     def transaction_by_id(tx_id: str):
-        db = get_db()
+        db = get_db(g.user_id)
         repo = TransactionRepository(db)
         tx = repo.by_id_and_user(tx_id, g.user_id)
         if not tx:
@@ -167,11 +313,15 @@ def register_transaction_routes(app, cfg, get_db):
     @app.delete("/api/v1/transactions/<tx_id>")
     @require_auth(cfg)
     def delete_transaction(tx_id: str):
-        db = get_db()
+        db = get_db(g.user_id)
         repo = TransactionRepository(db)
-        tx = repo.by_id_and_user(tx_id, g.user_id)
-        if not tx:
+        query = repo.filter_ids(repo.delete_base_for_user(g.user_id), [tx_id])
+        count, rows = repo.delete_matching(query)
+        if not count:
             return error_response(404, "NOT_FOUND", "transaction not found")
-        db.delete(tx)
         repo.commit()
+        if rows:
+            events.publish(g.user_id, transaction_deleted_event(rows[0]))
+        else:
+            events.publish(g.user_id, transactions_bulk_deleted_event(count))
         return jsonify({"deleted": True})
@@ -1,13 +1,43 @@
+import math
+import time
 import uuid
 from functools import wraps
 
 from flask import g, request
+from sqlalchemy.exc import OperationalError
 
+from internal import deadlines
+from internal.deadlines import ConcurrencyLimiter
 from internal.http.responses import error_response
 from internal.services import jwt_service
 
+# Endpoints not listed here (health checks, by-id lookups, single writes) are never queued.
+ROUTE_POOLS = {
+    "list_transactions": "heavy",
+    "transactions_summary": "heavy",
+    "transactions_timeseries": "heavy",
+    "transactions_bulk_delete": "heavy",
+    "login": "auth",
+    "forgot_password": "auth",
+    "reset_password": "auth",
+}
+STREAMING_ENDPOINTS = {"transaction_events"}
+
+
+def unavailable_response(code: str, message: str, retry_after: float):
+    response, status = error_response(503, code, message)
+    response.headers["Retry-After"] = str(max(math.ceil(retry_after), 1))
+    return response, status
+
+
+def register_middleware(app, get_db, rate_limiter, cfg, metrics) -> None:
+    request_timeout = cfg.request_timeout_seconds()
+    queue_timeout = cfg.admission_queue_timeout_seconds()
+    limiters = {
+        "heavy": ConcurrencyLimiter(cfg.admission_heavy_limit, cfg.admission_queue_size),
+        "auth": ConcurrencyLimiter(cfg.admission_auth_limit, cfg.admission_queue_size),
+    }
 
-def register_middleware(app, get_db, rate_limiter, cfg) -> None:
     @app.before_request
     def before_request() -> None:
         g.request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
@@ -15,6 +45,31 @@ def register_middleware(app, get_db, rate_limiter, cfg) -> None:
             key = request.headers.get("X-Forwarded-For", request.remote_addr or "unknown")
             if not rate_limiter.allow(key):
                 return error_response(429, "RATE_LIMITED", "too many requests")
+        if request.endpoint in STREAMING_ENDPOINTS:
+            return None
+        deadline = time.monotonic() + request_timeout
+        deadlines.current_deadline.set(deadline)
+        pool = ROUTE_POOLS.get(request.endpoint)
+        if pool is None:
+            return None
+        if not limiters[pool].acquire(min(queue_timeout, request_timeout)):
+            metrics.incr(f"admission.{pool}.shed")
+            return unavailable_response("OVERLOADED", "server is busy, retry later", queue_timeout)
+        g.admission_pool = pool
+        metrics.set(f"admission.{pool}.active", limiters[pool].active)
+        return None
+
+    @app.errorhandler(OperationalError)
+    def handle_operational_error(exc):
+        if not deadlines.expired():
+            raise exc
+        metrics.incr("requests.timed_out")
+        return unavailable_response("TIMEOUT", "request timed out", queue_timeout)
+
+    @app.errorhandler(deadlines.DeadlineExceeded)
+    def handle_deadline_exceeded(exc):
+        metrics.incr("requests.timed_out")
+        return unavailable_response("TIMEOUT", "request timed out", queue_timeout)
 
     @app.after_request
     def add_request_id(response):
@@ -26,16 +81,27 @@ def register_middleware(app, get_db, rate_limiter, cfg) -> None:
         db = g.pop("db", None)
         if db is not None:
             db.close()
+        for shard_db in g.pop("shard_dbs", {}).values():
+            shard_db.close()
+        pool = g.pop("admission_pool", None)
+        if pool is not None:
+            limiters[pool].release()
+            metrics.set(f"admission.{pool}.active", limiters[pool].active)
+        deadlines.current_deadline.set(None)
 
 
-def require_auth(cfg):
+def require_auth(cfg, allow_query_token: bool = False):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
             auth_header = request.headers.get("Authorization", "")
-            if not auth_header.startswith("Bearer "):
+            if auth_header.startswith("Bearer "):
+                token = auth_header.split(" ", 1)[1]
+            elif allow_query_token and request.args.get("access_token"):
+                # EventSource cannot send headers, so streaming routes accept the token in the URL.
+                token = request.args["access_token"]
+            else:
                 return error_response(401, "UNAUTHORIZED", "missing token")
-            token = auth_header.split(" ", 1)[1]
             try:
                 payload = jwt_service.decode_token(token, cfg.jwt_secret, algorithms=["HS256"])
             except jwt_service.JwtError:
@@ -43,6 +109,7 @@ def require_auth(cfg):
             g.user_id = payload.get("user_id")
             g.username = payload.get("username")
             g.role = payload.get("role")
+            g.token_expires_at = payload.get("exp")
             return fn(*args, **kwargs)
 
         return wrapper
@@ -5,9 +5,9 @@ from internal.http.handlers.transactions import register_transaction_routes
 from internal.http.handlers.users import register_user_routes
 
 
-def register_routes(app, cfg, get_db) -> None:
-    register_health_routes(app)
+def register_routes(app, cfg, get_db, events, metrics, analytics) -> None:
+    register_health_routes(app, metrics)
     register_auth_routes(app, cfg, get_db)
     register_me_routes(app, cfg, get_db)
     register_user_routes(app, cfg, get_db)
-    register_transaction_routes(app, cfg, get_db)
+    register_transaction_routes(app, cfg, get_db, events, analytics)
@@ -0,0 +1,110 @@
+from contextlib import contextmanager
+
+from sqlalchemy import bindparam, inspect, select, text, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateIndex
+
+from internal.models import Transaction
+from internal.services.transaction_service import local_date_for
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+LOCAL_DATE_COLUMNS = {
+    "local_year": "INTEGER",
+    "local_month": "INTEGER",
+    "local_date": "DATE",
+}
+BACKFILL_BATCH_SIZE = 1000
+MIGRATION_LOCK_KEY = 727001
+
+
+def run_migrations(engine) -> None:
+    # Workers start together: one migrates and backfills while the others wait, then
+    # find nothing left to do. No worker serves requests with unfilled local dates.
+    with migration_lock(engine):
+        inspector = inspect(engine)
+        if not inspector.has_table(Transaction.__tablename__):
+            return
+        existing = {
+            column["name"] for column in inspector.get_columns(Transaction.__tablename__)
+        }
+        for name, ddl_type in LOCAL_DATE_COLUMNS.items():
+            if name not in existing:
+                _add_column(engine, name, ddl_type)
+        with engine.begin() as conn:
+            for index in Transaction.__table__.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+        backfill_local_dates(engine)
+
+
+@contextmanager
+def migration_lock(engine):
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        return
+    database = engine.url.database
+    if engine.dialect.name != "sqlite" or fcntl is None or database in (None, "", ":memory:"):
+        yield
+        return
+    with open(f"{database}.migrate.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _add_column(engine, name: str, ddl_type: str) -> None:
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(
+                text(f"ALTER TABLE transactions ADD COLUMN IF NOT EXISTS {name} {ddl_type}")
+            )
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE transactions ADD COLUMN {name} {ddl_type}"))
+    except OperationalError as exc:
+        # Another worker added it between our inspection and the ALTER.
+        if "duplicate column" not in str(exc).lower():
+            raise
+
+
+def backfill_local_dates(engine, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    table = Transaction.__table__
+    pending = (
+        select(table.c.id, table.c.datetime_utc, table.c.timezone)
+        .where(table.c.local_date.is_(None))
+        .limit(batch_size)
+    )
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .values(
+            local_year=bindparam("year"),
+            local_month=bindparam("month"),
+            local_date=bindparam("day"),
+        )
+    )
+    updated = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(pending).all()
+            if not rows:
+                return updated
+            params = []
+            for row_id, datetime_utc, timezone_name in rows:
+                local = local_date_for(datetime_utc, timezone_name)
+                params.append(
+                    {"row_id": row_id, "year": local.year, "month": local.month, "day": local}
+                )
+            conn.execute(stmt, params)
+            updated += len(rows)
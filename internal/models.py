@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, String, Text
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import relationship
 
 from internal.db import Base
@@ -22,8 +22,41 @@ class User(Base):
     transactions = relationship("Transaction", back_populates="creator")
 
 
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    family_id = Column(String, nullable=False, index=True)
+    token_hash = Column(String, unique=True, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True))
+    replaced_by_id = Column(String)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+
+class UserShard(Base):
+    __tablename__ = "user_shards"
+
+    user_id = Column(String, primary_key=True)
+    shard_index = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_user_local_date", "created_by_user_id", "local_date"),
+        Index("ix_transactions_user_local_month", "created_by_user_id", "local_month"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     created_by_user_id = Column(String, ForeignKey("users.id"), nullable=False)
@@ -39,6 +72,10 @@ class Transaction(Base):
     description = Column(Text)
     datetime_utc = Column(DateTime(timezone=True), nullable=False)
     timezone = Column(String, nullable=False)
+    # Calendar parts of datetime_utc in the row's own timezone, kept in sync on insert.
+    local_year = Column(Integer)
+    local_month = Column(Integer)
+    local_date = Column(Date)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
@@ -1,3 +1,4 @@
+import threading
 import time
 from collections import deque
 
@@ -6,14 +7,24 @@ class RateLimiter:
     def __init__(self, per_minute: int) -> None:
         self.per_minute = per_minute
         self.hits: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
 
     def allow(self, key: str) -> bool:
         now = time.time()
         window_start = now - 60
-        queue = self.hits.setdefault(key, deque())
-        while queue and queue[0] < window_start:
-            queue.popleft()
-        if len(queue) >= self.per_minute:
-            return False
-        queue.append(now)
-        return True
+        with self._lock:
+            queue = self.hits.setdefault(key, deque())
+            while queue and queue[0] < window_start:
+                queue.popleft()
+            if len(queue) >= self.per_minute:
+                return False
+            queue.append(now)
+            return True
+
+    def prune(self) -> int:
+        window_start = time.time() - 60
+        with self._lock:
+            stale = [key for key, queue in self.hits.items() if not queue or queue[-1] < window_start]
+            for key in stale:
+                del self.hits[key]
+        return len(stale)
@@ -0,0 +1,45 @@
+import argparse
+
+from internal.config import Config
+from internal.db import init_db, init_engine, init_session
+from internal.sharding import init_shard_router, move_from_primary, move_user
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move a user's transactions to another shard.")
+    parser.add_argument("user_id", nargs="?")
+    parser.add_argument("shard_index", type=int, nargs="?")
+    parser.add_argument(
+        "--from-primary",
+        action="store_true",
+        help="move transactions stored in DATABASE_URL to the shards their users map to",
+    )
+    parser.add_argument(
+        "--settle-seconds",
+        type=float,
+        default=None,
+        help="how long to wait for workers to pick up the new placement",
+    )
+    args = parser.parse_args()
+
+    cfg = Config()
+    engine = init_engine(cfg.db_url)
+    init_db(engine)
+    router = init_shard_router(cfg, engine, init_session(engine))
+    if router is None:
+        parser.error("SHARD_DATABASE_URLS is not configured")
+    if args.from_primary:
+        moved = move_from_primary(router, engine)
+        print(f"moved {moved} transactions out of the primary database")
+        return
+    if args.user_id is None or args.shard_index is None:
+        parser.error("user_id and shard_index are required")
+    try:
+        moved = move_user(router, args.user_id, args.shard_index, args.settle_seconds)
+    except ValueError as exc:
+        parser.error(str(exc))
+    print(f"moved {moved} transactions to shard {args.shard_index}")
+
+
+if __name__ == "__main__":
+    main()
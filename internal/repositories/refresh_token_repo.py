@@ -0,0 +1,45 @@
+from sqlalchemy import lambda_stmt, select, update
+
+from internal.models import RefreshToken
+
+
+class RefreshTokenRepository:
+    def __init__(self, db):
+        self.db = db
+
+    def add(self, token: RefreshToken) -> None:
+        self.db.add(token)
+
+    def commit(self) -> None:
+        self.db.commit()
+
+    def get_by_hash(self, token_hash: str) -> RefreshToken | None:
+        stmt = lambda_stmt(
+            lambda: select(RefreshToken).where(RefreshToken.token_hash == token_hash)
+        )
+        return self.db.execute(stmt).scalars().first()
+
+    def revoke_if_active(self, token_id: str, revoked_at, replaced_by_id: str | None) -> bool:
+        stmt = lambda_stmt(
+            lambda: update(RefreshToken)
+            .where(RefreshToken.id == token_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=revoked_at, replaced_by_id=replaced_by_id)
+        )
+        result = self.db.execute(stmt, execution_options={"synchronize_session": False})
+        return result.rowcount == 1
+
+    def revoke_family(self, family_id: str, revoked_at) -> None:
+        stmt = lambda_stmt(
+            lambda: update(RefreshToken)
+            .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=revoked_at)
+        )
+        self.db.execute(stmt, execution_options={"synchronize_session": False})
+
+    def revoke_for_user(self, user_id: str, revoked_at) -> None:
+        stmt = lambda_stmt(
+            lambda: update(RefreshToken)
+            .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=revoked_at)
+        )
+        self.db.execute(stmt, execution_options={"synchronize_session": False})
@@ -1,7 +1,27 @@
-from sqlalchemy import func
+from sqlalchemy import delete, func, lambda_stmt, select
 
 from internal.models import Transaction
 
+# Statements are built as lambda statements: SQLAlchemy caches the constructed and compiled
+# form per code location, so each filter/sort combination is only built once per process.
+SORT_COLUMNS = {
+    "receiver": Transaction.receiver_name,
+    "payer": Transaction.payer_name,
+    "amount": Transaction.amount,
+    "currency": Transaction.currency,
+    "date": Transaction.datetime_utc,
+}
+SQLITE_BUCKETS = {
+    "day": func.strftime("%Y-%m-%d", Transaction.local_date),
+    "week": func.date(Transaction.local_date, "-6 days", "weekday 1"),
+    "month": func.strftime("%Y-%m-01", Transaction.local_date),
+    "year": func.strftime("%Y-01-01", Transaction.local_date),
+}
+POSTGRES_BUCKETS = {
+    granularity: func.to_char(func.date_trunc(granularity, Transaction.local_date), "YYYY-MM-DD")
+    for granularity in ("day", "week", "month", "year")
+}
+
 
 class TransactionRepository:
     def __init__(self, db):
@@ -17,38 +37,110 @@ class TransactionRepository:
         self.db.refresh(tx)
 
     def by_id_and_user(self, tx_id: str, user_id: str) -> Transaction | None:
-        return (
-            self.db.query(Transaction)
-            .filter(Transaction.id == tx_id, Transaction.created_by_user_id == user_id)
-            .first()
+        stmt = lambda_stmt(
+            lambda: select(Transaction).where(
+                Transaction.id == tx_id, Transaction.created_by_user_id == user_id
+            )
         )
+        return self.db.execute(stmt).scalars().first()
+
+    def by_ids_and_user(self, tx_ids: list[str], user_id: str) -> list[Transaction]:
+        # Filter by owner in Python: with the owner in the WHERE clause SQLite may pick a
+        # per-user index and scan all of the user's rows instead of the primary key.
+        stmt = lambda_stmt(lambda: select(Transaction).where(Transaction.id.in_(tx_ids)))
+        rows = self.db.execute(stmt).scalars().all()
+        return [tx for tx in rows if tx.created_by_user_id == user_id]
 
     def base_for_user(self, user_id: str):
-        return self.db.query(Transaction).filter(Transaction.created_by_user_id == user_id)
+        return lambda_stmt(
+            lambda: select(Transaction).where(Transaction.created_by_user_id == user_id)
+        )
 
-    def total_amount(self, query):
-        return query.with_entities(func.coalesce(func.sum(Transaction.amount), 0.0)).scalar()
+    def delete_base_for_user(self, user_id: str):
+        return lambda_stmt(
+            lambda: delete(Transaction).where(Transaction.created_by_user_id == user_id)
+        )
 
-    def avg_amount(self, query):
-        return query.with_entities(func.coalesce(func.avg(Transaction.amount), 0.0)).scalar()
+    def filter_ids(self, query, tx_ids: list[str]):
+        return query + (lambda s: s.where(Transaction.id.in_(tx_ids)))
 
-    def count(self, query):
-        return query.count()
+    def delete_matching(self, query, returning: bool = True):
+        options = {"synchronize_session": False}
+        if not returning or not self.db.get_bind().dialect.delete_returning:
+            result = self.db.execute(query, execution_options=options)
+            return result.rowcount, None
+        query = query + (
+            lambda s: s.returning(
+                Transaction.id,
+                Transaction.currency,
+                Transaction.local_month,
+                Transaction.amount,
+                Transaction.datetime_utc,
+                Transaction.timezone,
+            )
+        )
+        rows = self.db.execute(query, execution_options=options).all()
+        return len(rows), rows
 
-    def monthly_totals(self, query):
-        return (
-            query.with_entities(
-                func.to_char(func.date_trunc("month", Transaction.datetime_utc), "MM"),
+    def page(self, query, sort_by: str, sort_dir: str, page: int, per_page: int):
+        total = self.count(query)
+        column = SORT_COLUMNS.get(sort_by, Transaction.datetime_utc)
+        if sort_dir == "desc":
+            query = query + (lambda s: s.order_by(column.desc()))
+        else:
+            query = query + (lambda s: s.order_by(column.asc()))
+        offset = (page - 1) * per_page
+        query = query + (lambda s: s.limit(per_page).offset(offset))
+        return total, self.db.execute(query).scalars().all()
+
+    def kpis(self, query) -> tuple[float, float, int]:
+        query = query + (
+            lambda s: s.with_only_columns(
                 func.coalesce(func.sum(Transaction.amount), 0.0),
+                func.coalesce(func.avg(Transaction.amount), 0.0),
+                func.count(Transaction.id),
             )
-            .group_by(1)
-            .order_by(1)
-            .all()
         )
+        total_amount, avg_amount, count = self.db.execute(query).one()
+        return total_amount, avg_amount, count
+
+    def count(self, query) -> int:
+        query = query + (
+            lambda s: s.with_only_columns(func.count(), maintain_column_froms=True)
+        )
+        return self.db.execute(query).scalar()
+
+    def monthly_totals(self, query):
+        query = query + (
+            lambda s: s.with_only_columns(
+                Transaction.local_month, func.coalesce(func.sum(Transaction.amount), 0.0)
+            )
+            .group_by(Transaction.local_month)
+            .order_by(Transaction.local_month)
+        )
+        return self.db.execute(query).all()
+
+    def timeseries_totals(self, query, granularity: str):
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "sqlite":
+            bucket = SQLITE_BUCKETS[granularity]
+        elif dialect == "postgresql":
+            bucket = POSTGRES_BUCKETS[granularity]
+        else:
+            bucket = Transaction.local_date
+        query = query + (
+            lambda s: s.with_only_columns(
+                bucket,
+                func.coalesce(func.sum(Transaction.amount), 0.0),
+                func.count(Transaction.id),
+            ).group_by(bucket)
+        )
+        return self.db.execute(query).all()
 
     def totals_by_currency(self, query):
-        return (
-            query.with_entities(Transaction.currency, func.coalesce(func.sum(Transaction.amount), 0.0))
-            .group_by(Transaction.currency)
-            .all()
+        query = query + (
+            lambda s: s.with_only_columns(
+                Transaction.currency, func.coalesce(func.sum(Transaction.amount), 0.0)
+            ).group_by(Transaction.currency)
         )
+        return self.db.execute(query).all()
@@ -1,3 +1,5 @@
+from sqlalchemy import func, lambda_stmt, select
+
 from internal.models import User
 
 
@@ -6,16 +8,20 @@ class UserRepository:
         self.db = db
 
     def get_by_username(self, username: str) -> User | None:
-        return self.db.query(User).filter(User.username == username).first()
+        stmt = lambda_stmt(lambda: select(User).where(User.username == username))
+        return self.db.execute(stmt).scalars().first()
 
     def get_by_id(self, user_id: str) -> User | None:
-        return self.db.query(User).filter(User.id == user_id).first()
+        stmt = lambda_stmt(lambda: select(User).where(User.id == user_id))
+        return self.db.execute(stmt).scalars().first()
 
     def exists_username(self, username: str) -> bool:
-        return self.db.query(User).filter(User.username == username).first() is not None
+        stmt = lambda_stmt(lambda: select(User.id).where(User.username == username).limit(1))
+        return self.db.execute(stmt).first() is not None
 
     def count(self) -> int:
-        return self.db.query(User).count()
+        stmt = lambda_stmt(lambda: select(func.count()).select_from(User))
+        return self.db.execute(stmt).scalar()
 
     def add(self, user: User) -> None:
         self.db.add(user)
@@ -0,0 +1,219 @@
+import logging
+import random
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from internal.models import RefreshToken, SchedulerLease, User
+
+LEASE_NAME = "maintenance"
+LEASE_SECONDS = 60
+TICK_SECONDS = 1.0
+JITTER = 0.1
+VACUUM_PAGES = 500
+AUTO_VACUUM_INCREMENTAL = 2
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    name: str
+    interval: float
+    func: Callable[[float], None]
+    budget: float
+    leader_only: bool = True
+    next_run: float = field(default=0.0)
+
+
+class Scheduler:
+    def __init__(self, engine, metrics, jitter: float = JITTER) -> None:
+        self.engine = engine
+        self.metrics = metrics
+        self.jitter = jitter
+        self.holder = str(uuid.uuid4())
+        self.jobs: list[Job] = []
+        self.is_leader = False
+        self._lease_renewed_at = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add_job(self, name: str, interval: float, func, budget: float, leader_only=True) -> None:
+        # Spread first runs so workers started together do not line up.
+        first_run = time.monotonic() + random.uniform(0, interval * self.jitter)
+        self.jobs.append(Job(name, interval, func, budget, leader_only, first_run))
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def run_pending(self) -> None:
+        now = time.monotonic()
+        if any(job.leader_only for job in self.jobs):
+            if now - self._lease_renewed_at >= LEASE_SECONDS / 3:
+                self._renew_lease()
+        for job in self.jobs:
+            if job.next_run > now:
+                continue
+            spread = job.interval * self.jitter
+            job.next_run = now + job.interval + random.uniform(-spread, spread)
+            if job.leader_only:
+                # Leadership may have moved since the last tick; confirm it right before running.
+                self._renew_lease()
+                if not self.is_leader:
+                    continue
+            self._run_job(job)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception:
+                logger.exception("maintenance scheduler tick failed")
+            self._stop.wait(TICK_SECONDS)
+
+    def _run_job(self, job: Job) -> None:
+        started = time.monotonic()
+        done = threading.Event()
+        if job.leader_only:
+            # Jobs such as VACUUM can outlast the lease, so keep renewing it while they run.
+            threading.Thread(target=self._hold_lease, args=(done,), daemon=True).start()
+        try:
+            job.func(started + job.budget)
+        except Exception:
+            self.metrics.incr(f"scheduler.{job.name}.failures")
+            logger.exception("maintenance job %s failed", job.name)
+        finally:
+            done.set()
+        elapsed = time.monotonic() - started
+        self.metrics.incr(f"scheduler.{job.name}.runs")
+        self.metrics.set(f"scheduler.{job.name}.last_duration_ms", round(elapsed * 1000, 2))
+        if elapsed > job.budget:
+            self.metrics.incr(f"scheduler.{job.name}.over_budget")
+
+    def _renew_lease(self) -> None:
+        self.is_leader = self._acquire_lease()
+        self._lease_renewed_at = time.monotonic()
+        self.metrics.set("scheduler.is_leader", int(self.is_leader))
+
+    def _hold_lease(self, done: threading.Event) -> None:
+        while not done.wait(LEASE_SECONDS / 3):
+            try:
+                self._renew_lease()
+            except Exception:
+                logger.exception("failed to renew scheduler lease")
+
+    def _acquire_lease(self) -> bool:
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=LEASE_SECONDS)
+        lease = SchedulerLease.__table__
+        try:
+            with self.engine.begin() as conn:
+                result = conn.execute(
+                    update(lease)
+                    .where(lease.c.name == LEASE_NAME)
+                    .where((lease.c.holder == self.holder) | (lease.c.expires_at < now))
+                    .values(holder=self.holder, expires_at=expires_at)
+                )
+                if result.rowcount:
+                    return True
+                conn.execute(
+                    insert(lease).values(name=LEASE_NAME, holder=self.holder, expires_at=expires_at)
+                )
+                return True
+        except IntegrityError:
+            return False
+
+
+def purge_expired_reset_codes(engine):
+    def job(deadline: float) -> None:
+        users = User.__table__
+        with engine.begin() as conn:
+            conn.execute(
+                update(users)
+                .where(users.c.reset_code_expires_at < datetime.now(timezone.utc))
+                .values(reset_code_hash=None, reset_code_expires_at=None)
+            )
+
+    return job
+
+
+def purge_expired_refresh_tokens(engine):
+    def job(deadline: float) -> None:
+        # Revoked tokens are kept until they expire so that replaying one still trips reuse detection.
+        tokens = RefreshToken.__table__
+        with engine.begin() as conn:
+            conn.execute(delete(tokens).where(tokens.c.expires_at < datetime.now(timezone.utc)))
+
+    return job
+
+
+def prune_rate_limiter(rate_limiter):
+    def job(deadline: float) -> None:
+        rate_limiter.prune()
+
+    return job
+
+
+def sqlite_checkpoint(engines):
+    def job(deadline: float) -> None:
+        for engine in engines:
+            with engine.connect() as conn:
+                conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    return job
+
+
+def sqlite_analyze(engines):
+    def job(deadline: float) -> None:
+        for engine in engines:
+            if time.monotonic() >= deadline:
+                return
+            with engine.connect() as conn:
+                conn.exec_driver_sql("PRAGMA analysis_limit=1000")
+                conn.exec_driver_sql("ANALYZE")
+                conn.commit()
+
+    return job
+
+
+def sqlite_incremental_vacuum(engines):
+    def job(deadline: float) -> None:
+        for engine in engines:
+            with engine.connect() as conn:
+                if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != AUTO_VACUUM_INCREMENTAL:
+                    continue
+                # Return free pages a batch at a time so writers are only ever briefly blocked,
+                # unlike VACUUM, which rewrites the file under an exclusive lock.
+                while time.monotonic() < deadline:
+                    if not conn.exec_driver_sql("PRAGMA freelist_count").scalar():
+                        break
+                    conn.exec_driver_sql(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+                    conn.commit()
+
+    return job
+
+
+def init_scheduler(engine, shard_engines, rate_limiter, metrics) -> Scheduler:
+    engines = [engine] + [shard for shard in shard_engines if shard is not engine]
+    sqlite_engines = [e for e in engines if e.dialect.name == "sqlite"]
+    scheduler = Scheduler(engine, metrics)
+    scheduler.add_job("prune_rate_limiter", 60, prune_rate_limiter(rate_limiter), 1, False)
+    scheduler.add_job("purge_reset_codes", 600, purge_expired_reset_codes(engine), 5)
+    scheduler.add_job("purge_refresh_tokens", 3600, purge_expired_refresh_tokens(engine), 10)
+    if sqlite_engines:
+        scheduler.add_job("sqlite_checkpoint", 300, sqlite_checkpoint(sqlite_engines), 5)
+        scheduler.add_job("sqlite_analyze", 3600, sqlite_analyze(sqlite_engines), 60)
+        scheduler.add_job("sqlite_vacuum", 600, sqlite_incremental_vacuum(sqlite_engines), 2)
+    return scheduler
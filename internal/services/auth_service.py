@@ -1,8 +1,11 @@
+import hashlib
 import os
+import secrets
+import uuid
 from datetime import datetime, timedelta, timezone
 
 import bcrypt
-from internal.models import User
+from internal.models import RefreshToken, User
 from internal.services import jwt_service
 
 
@@ -33,3 +36,32 @@ def generate_token(user: User, jwt_secret: str, expires_in: int) -> tuple[str, i
 
 def generate_reset_code() -> str:
     return "".join(str(int.from_bytes(os.urandom(1), "big") % 10) for _ in range(6))
+
+
+def generate_refresh_token() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def hash_refresh_token(token: str) -> str:
+    # Refresh tokens are 256 random bits, so a fast digest is enough; bcrypt would defeat the point.
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def issue_refresh_token(repo, user_id: str, expires_in: int, family_id: str | None = None):
+    token = generate_refresh_token()
+    row = RefreshToken(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        family_id=family_id or str(uuid.uuid4()),
+        token_hash=hash_refresh_token(token),
+        expires_at=datetime.now(timezone.utc) + timedelta(seconds=expires_in),
+        created_at=datetime.now(timezone.utc),
+    )
+    repo.add(row)
+    return token, row
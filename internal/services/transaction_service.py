@@ -1,9 +1,15 @@
-from datetime import datetime, timedelta, timezone
-
-from sqlalchemy import func
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from internal.models import Transaction
 
+TRANSACTION_FILTER_KEYS = ("search", "date_from", "date_to", "currency", "min_amount", "month")
+MAX_BATCH_IDS = 500
+MAX_EVENT_IDS = 100
+TIMESERIES_GRANULARITIES = ("day", "week", "month", "year")
+TIMESERIES_DEFAULT_BUCKETS = {"day": 30, "week": 12, "month": 12, "year": 5}
+MAX_TIMESERIES_BUCKETS = 1000
+
 
 def parse_datetime_iso(value: str) -> datetime | None:
     try:
@@ -15,6 +21,27 @@ def parse_datetime_iso(value: str) -> datetime | None:
     return parsed.astimezone(timezone.utc)
 
 
+def resolve_timezone(name: str) -> ZoneInfo | None:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return None
+
+
+def local_date_for(datetime_utc: datetime, timezone_name: str) -> date:
+    if datetime_utc.tzinfo is None:
+        datetime_utc = datetime_utc.replace(tzinfo=timezone.utc)
+    tz = resolve_timezone(timezone_name) or timezone.utc
+    return datetime_utc.astimezone(tz).date()
+
+
+def set_local_date_fields(tx: Transaction) -> None:
+    local = local_date_for(tx.datetime_utc, tx.timezone)
+    tx.local_year = local.year
+    tx.local_month = local.month
+    tx.local_date = local
+
+
 def transaction_to_response(tx: Transaction) -> dict:
     return {
         "id": tx.id,
@@ -38,36 +65,88 @@ def transaction_to_response(tx: Transaction) -> dict:
     }
 
 
-def apply_transaction_filters(query, params):
+def summary_delta(tx, sign: int) -> dict:
+    month = tx.local_month
+    if month is None:
+        # Rows written before the local date columns existed may not be backfilled yet.
+        month = local_date_for(tx.datetime_utc, tx.timezone).month
+    return {
+        "currency": tx.currency,
+        "month": f"{month:02d}",
+        "amount": sign * tx.amount,
+        "count": sign,
+    }
+
+
+def transaction_created_event(tx: Transaction) -> dict:
+    return {
+        "type": "transaction.created",
+        "transaction": transaction_to_response(tx),
+        "summary_delta": summary_delta(tx, 1),
+    }
+
+
+def transaction_deleted_event(tx) -> dict:
+    return {
+        "type": "transaction.deleted",
+        "transaction_id": tx.id,
+        "summary_delta": summary_delta(tx, -1),
+    }
+
+
+def transactions_bulk_deleted_event(count: int, rows=None) -> dict:
+    event = {"type": "transaction.bulk_deleted", "count": count}
+    # Larger deletes only carry the count; subscribers refetch and caches drop the user.
+    if rows is not None and len(rows) <= MAX_EVENT_IDS:
+        deltas: dict[tuple, dict] = {}
+        for row in rows:
+            delta = summary_delta(row, -1)
+            key = (delta["currency"], delta["month"])
+            if key in deltas:
+                deltas[key]["amount"] += delta["amount"]
+                deltas[key]["count"] += delta["count"]
+            else:
+                deltas[key] = delta
+        event["transaction_ids"] = [row.id for row in rows]
+        event["summary_deltas"] = list(deltas.values())
+    return event
+
+
+def parse_id_list(value) -> list[str]:
+    if not isinstance(value, list) or not value:
+        raise ValueError("ids must be a non-empty list")
+    if len(value) > MAX_BATCH_IDS:
+        raise ValueError(f"at most {MAX_BATCH_IDS} ids per request")
+    if not all(isinstance(tx_id, str) and tx_id for tx_id in value):
+        raise ValueError("ids must be strings")
+    return list(dict.fromkeys(value))
+
+
+def parse_transaction_filters(params) -> dict:
+    filters = {}
     search = params.get("search")
     if search:
-        query = query.filter(
-            Transaction.receiver_name.ilike(f"%{search}%")
-            | Transaction.payer_name.ilike(f"%{search}%")
-        )
+        filters["search"] = search
     date_from = params.get("date_from")
     if date_from:
         try:
-            parsed = datetime.strptime(date_from, "%Y-%m-%d")
-            query = query.filter(Transaction.datetime_utc >= parsed)
-        except ValueError as exc:
+            filters["date_from"] = datetime.strptime(date_from, "%Y-%m-%d").date()
+        except (TypeError, ValueError) as exc:
             raise ValueError("invalid date_from") from exc
     date_to = params.get("date_to")
     if date_to:
         try:
-            parsed = datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)
-            query = query.filter(Transaction.datetime_utc < parsed)
-        except ValueError as exc:
+            filters["date_to"] = datetime.strptime(date_to, "%Y-%m-%d").date()
+        except (TypeError, ValueError) as exc:
             raise ValueError("invalid date_to") from exc
     currency = params.get("currency")
     if currency:
-        query = query.filter(Transaction.currency == currency)
+        filters["currency"] = currency
     min_amount = params.get("min_amount")
     if min_amount:
         try:
-            amount = float(min_amount)
-            query = query.filter(Transaction.amount >= amount)
-        except ValueError as exc:
+            filters["min_amount"] = float(min_amount)
+        except (TypeError, ValueError) as exc:
             raise ValueError("invalid min_amount") from exc
     month = params.get("month")
     if month:
@@ -75,7 +154,117 @@ def apply_transaction_filters(query, params):
             month_int = int(month)
             if month_int < 1 or month_int > 12:
                 raise ValueError
-        except ValueError as exc:
+        except (TypeError, ValueError) as exc:
             raise ValueError("invalid month") from exc
-        query = query.filter(func.extract("month", Transaction.datetime_utc) == month_int)
+        filters["month"] = month_int
+    return filters
+
+
+def escape_like(value: str) -> str:
+    # Search is a plain substring match, as in the analytics cache, so wildcards are literal.
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def apply_transaction_filters(query, params):
+    filters = parse_transaction_filters(params)
+    if "search" in filters:
+        pattern = f"%{escape_like(filters['search'])}%"
+        query += lambda s: s.where(
+            Transaction.receiver_name.ilike(pattern, escape="\\")
+            | Transaction.payer_name.ilike(pattern, escape="\\")
+        )
+    if "date_from" in filters:
+        date_from = filters["date_from"]
+        query += lambda s: s.where(Transaction.local_date >= date_from)
+    if "date_to" in filters:
+        date_to = filters["date_to"]
+        query += lambda s: s.where(Transaction.local_date <= date_to)
+    if "currency" in filters:
+        currency = filters["currency"]
+        query += lambda s: s.where(Transaction.currency == currency)
+    if "min_amount" in filters:
+        min_amount = filters["min_amount"]
+        query += lambda s: s.where(Transaction.amount >= min_amount)
+    if "month" in filters:
+        month = filters["month"]
+        query += lambda s: s.where(Transaction.local_month == month)
     return query
+
+
+def bucket_start(value: date, granularity: str) -> date:
+    if granularity == "week":
+        return value - timedelta(days=value.weekday())
+    if granularity == "month":
+        return value.replace(day=1)
+    if granularity == "year":
+        return value.replace(month=1, day=1)
+    return value
+
+
+def next_bucket(value: date, granularity: str) -> date:
+    if granularity == "day":
+        return value + timedelta(days=1)
+    if granularity == "week":
+        return value + timedelta(weeks=1)
+    if granularity == "month":
+        if value.month == 12:
+            return value.replace(year=value.year + 1, month=1)
+        return value.replace(month=value.month + 1)
+    return value.replace(year=value.year + 1)
+
+
+def timeseries_range(params, today: date) -> tuple[str, date, date]:
+    granularity = params.get("granularity", "month")
+    if granularity not in TIMESERIES_GRANULARITIES:
+        raise ValueError("invalid granularity")
+    date_to = today
+    if params.get("date_to"):
+        try:
+            date_to = datetime.strptime(params["date_to"], "%Y-%m-%d").date()
+        except ValueError as exc:
+            raise ValueError("invalid date_to") from exc
+    if params.get("date_from"):
+        try:
+            date_from = datetime.strptime(params["date_from"], "%Y-%m-%d").date()
+        except ValueError as exc:
+            raise ValueError("invalid date_from") from exc
+    else:
+        date_from = bucket_start(date_to, granularity)
+        for _ in range(TIMESERIES_DEFAULT_BUCKETS[granularity] - 1):
+            date_from = bucket_start(date_from - timedelta(days=1), granularity)
+    if date_from > date_to:
+        raise ValueError("date_from must not be after date_to")
+    if _bucket_count(date_from, date_to, granularity) > MAX_TIMESERIES_BUCKETS:
+        raise ValueError(f"range exceeds {MAX_TIMESERIES_BUCKETS} buckets")
+    return granularity, date_from, date_to
+
+
+def fill_timeseries(rows, date_from: date, date_to: date, granularity: str) -> list[dict]:
+    totals: dict[date, list] = {}
+    for bucket, amount, count in rows:
+        if bucket is None:
+            continue
+        if isinstance(bucket, str):
+            bucket = date.fromisoformat(bucket)
+        # Dialects without a native bucket expression group by day; fold those here.
+        key = bucket_start(bucket, granularity)
+        entry = totals.setdefault(key, [0.0, 0])
+        entry[0] += amount
+        entry[1] += count
+    buckets = []
+    current = bucket_start(date_from, granularity)
+    while current <= date_to:
+        amount, count = totals.get(current, (0.0, 0))
+        buckets.append({"start": current.isoformat(), "amount": amount, "count": count})
+        current = next_bucket(current, granularity)
+    return buckets
+
+
+def _bucket_count(date_from: date, date_to: date, granularity: str) -> int:
+    if granularity == "day":
+        return (date_to - date_from).days + 1
+    if granularity == "week":
+        return (bucket_start(date_to, "week") - bucket_start(date_from, "week")).days // 7 + 1
+    if granularity == "month":
+        return (date_to.year - date_from.year) * 12 + date_to.month - date_from.month + 1
+    return date_to.year - date_from.year + 1
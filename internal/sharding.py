@@ -0,0 +1,181 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from internal.db import init_engine, init_session
+from internal.deadlines import install_statement_timeouts
+from internal.migrations import run_migrations
+from internal.models import Transaction, UserShard
+
+SHARD_STRATEGIES = ("hash", "directory")
+DIRECTORY_CACHE_SECONDS = 30
+MOVE_BATCH_SIZE = 1000
+
+
+def hash_shard(user_id: str, shard_count: int) -> int:
+    digest = hashlib.sha1(user_id.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+
+class ShardRouter:
+    def __init__(self, engines, primary_session, strategy: str = "hash") -> None:
+        if strategy not in SHARD_STRATEGIES:
+            raise ValueError(f"unknown SHARD_STRATEGY: {strategy}")
+        self.engines = engines
+        self.sessions = [init_session(engine) for engine in engines]
+        self.primary_session = primary_session
+        self.strategy = strategy
+        self._lock = threading.Lock()
+        self._cache: dict[str, tuple[int, float]] = {}
+
+    def shard_for(self, user_id: str) -> int:
+        if self.strategy == "hash":
+            return hash_shard(user_id, len(self.engines))
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(user_id)
+        if cached and cached[1] > now:
+            return cached[0]
+        index = self._lookup_or_assign(user_id)
+        with self._lock:
+            self._cache[user_id] = (index, now + DIRECTORY_CACHE_SECONDS)
+        return index
+
+    def assign(self, user_id: str, shard_index: int) -> None:
+        db = self.primary_session()
+        try:
+            entry = db.get(UserShard, user_id)
+            if entry is None:
+                db.add(UserShard(user_id=user_id, shard_index=shard_index))
+            else:
+                entry.shard_index = shard_index
+                entry.updated_at = datetime.now(timezone.utc)
+            db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            self._cache.pop(user_id, None)
+
+    def _lookup_or_assign(self, user_id: str) -> int:
+        db = self.primary_session()
+        try:
+            entry = db.get(UserShard, user_id)
+            if entry is not None:
+                return entry.shard_index
+            index = hash_shard(user_id, len(self.engines))
+            db.add(UserShard(user_id=user_id, shard_index=index))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker placed this user first; use its choice.
+                db.rollback()
+                return db.get(UserShard, user_id).shard_index
+            return index
+        finally:
+            db.close()
+
+
+def init_shard_db(engine) -> None:
+    # Shards hold only transactions; their users live in the primary database, so the
+    # created_by_user_id foreign key cannot be enforced there.
+    table = Transaction.__table__
+    with engine.begin() as conn:
+        conn.execute(CreateTable(table, include_foreign_key_constraints=[], if_not_exists=True))
+        for index in table.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def init_shard_router(cfg, engine, primary_session) -> ShardRouter | None:
+    if not cfg.shard_db_urls:
+        return None
+    engines = []
+    for url in cfg.shard_db_urls:
+        if url == cfg.db_url:
+            engines.append(engine)
+            continue
+        shard_engine = init_engine(url)
+        init_shard_db(shard_engine)
+        run_migrations(shard_engine)
+        install_statement_timeouts(shard_engine)
+        engines.append(shard_engine)
+    return ShardRouter(engines, primary_session, cfg.shard_strategy)
+
+
+def move_user(router: ShardRouter, user_id: str, target: int, settle_seconds=None) -> int:
+    if router.strategy != "directory":
+        raise ValueError("moving users requires SHARD_STRATEGY=directory")
+    if not 0 <= target < len(router.engines):
+        raise ValueError(f"shard index must be between 0 and {len(router.engines) - 1}")
+    source = router.shard_for(user_id)
+    if source == target:
+        return 0
+    table = Transaction.__table__
+    source_engine = router.engines[source]
+    target_engine = router.engines[target]
+
+    copied = _copy_rows(source_engine, target_engine, user_id, set())
+    router.assign(user_id, target)
+    # Other workers keep routing to the old shard until their directory cache expires.
+    time.sleep(DIRECTORY_CACHE_SECONDS if settle_seconds is None else settle_seconds)
+    copied |= _copy_rows(source_engine, target_engine, user_id, copied)
+
+    with source_engine.connect() as conn:
+        remaining = set(
+            conn.execute(select(table.c.id).where(table.c.created_by_user_id == user_id)).scalars()
+        )
+    deleted_meanwhile = copied - remaining
+    with target_engine.begin() as conn:
+        for chunk in _chunks(sorted(deleted_meanwhile)):
+            conn.execute(delete(table).where(table.c.id.in_(chunk)))
+    with source_engine.begin() as conn:
+        conn.execute(delete(table).where(table.c.created_by_user_id == user_id))
+    return len(remaining)
+
+
+def move_from_primary(router: ShardRouter, primary_engine) -> int:
+    table = Transaction.__table__
+    with primary_engine.connect() as conn:
+        user_ids = conn.execute(select(table.c.created_by_user_id).distinct()).scalars().all()
+    moved = 0
+    for user_id in user_ids:
+        target_engine = router.engines[router.shard_for(user_id)]
+        if target_engine is primary_engine:
+            continue
+        with target_engine.connect() as conn:
+            # Rows copied by an earlier, interrupted run are already on the shard.
+            present = set(
+                conn.execute(
+                    select(table.c.id).where(table.c.created_by_user_id == user_id)
+                ).scalars()
+            )
+        copied = _copy_rows(primary_engine, target_engine, user_id, present)
+        with primary_engine.begin() as conn:
+            for chunk in _chunks(sorted(copied | present)):
+                conn.execute(delete(table).where(table.c.id.in_(chunk)))
+        moved += len(copied)
+    return moved
+
+
+def _copy_rows(source_engine, target_engine, user_id: str, skip_ids: set[str]) -> set[str]:
+    table = Transaction.__table__
+    copied = set()
+    with source_engine.connect() as source_conn, target_engine.begin() as target_conn:
+        result = source_conn.execution_options(yield_per=MOVE_BATCH_SIZE).execute(
+            select(table).where(table.c.created_by_user_id == user_id)
+        )
+        for rows in result.mappings().partitions():
+            batch = [dict(row) for row in rows if row["id"] not in skip_ids]
+            if batch:
+                target_conn.execute(insert(table), batch)
+                copied.update(row["id"] for row in batch)
+    return copied
+
+
+def _chunks(values: list, size: int = MOVE_BATCH_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
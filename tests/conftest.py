@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path}/test.db")
+    monkeypatch.setenv("SCHEDULER_ENABLED", "false")
+    monkeypatch.setenv("ANALYTICS_CACHE_MB", "0")
+    monkeypatch.setenv("RATE_LIMIT_PER_MIN", "1000")
+    from internal.app import create_app
+
+    return create_app()
@@ -0,0 +1,55 @@
+import pytest
+
+CREDENTIALS = {"username": "user1", "password": "1111"}
+
+
+def login(client) -> dict:
+    resp = client.post("/api/v1/auth/login", json=CREDENTIALS)
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def refresh(client, token):
+    return client.post("/api/v1/auth/refresh", json={"refresh_token": token})
+
+
+def test_refresh_rotates_the_token(app):
+    client = app.test_client()
+    first = login(client)["refresh_token"]
+
+    resp = refresh(client, first)
+    body = resp.get_json()
+
+    assert resp.status_code == 200
+    assert body["refresh_token"] != first
+    assert body["user"]["username"] == "user1"
+    headers = {"Authorization": f"Bearer {body['access_token']}"}
+    assert client.get("/api/v1/transactions", headers=headers).status_code == 200
+
+
+def test_reusing_a_rotated_token_revokes_the_family(app):
+    client = app.test_client()
+    first = login(client)["refresh_token"]
+    second = refresh(client, first).get_json()["refresh_token"]
+
+    assert refresh(client, first).status_code == 401
+    assert refresh(client, second).status_code == 401
+
+
+def test_logout_revokes_the_token(app):
+    client = app.test_client()
+    token = login(client)["refresh_token"]
+
+    assert client.post("/api/v1/auth/logout", json={"refresh_token": token}).status_code == 200
+    assert refresh(client, token).status_code == 401
+
+
+@pytest.mark.parametrize("path", ["/api/v1/auth/refresh", "/api/v1/auth/logout"])
+@pytest.mark.parametrize("value", [123, ["token"], {"token": 1}])
+def test_non_string_tokens_are_rejected(app, path, value):
+    resp = app.test_client().post(path, json={"refresh_token": value})
+    assert resp.status_code == 400
+
+
+def test_unknown_token_is_rejected(app):
+    assert refresh(app.test_client(), "not-a-token").status_code == 401
@@ -0,0 +1,139 @@
+import json
+
+from internal.events import (
+    MAX_NOTIFY_BYTES,
+    EventBroker,
+    LocalBackend,
+    PostgresBackend,
+    Subscription,
+    format_sse,
+)
+
+
+def created(tx_id: str) -> dict:
+    return {"type": "transaction.created", "transaction": {"id": tx_id}}
+
+
+def test_publish_fans_out_to_every_subscriber_of_the_user():
+    broker = EventBroker(LocalBackend())
+    first = broker.subscribe("u1")
+    second = broker.subscribe("u1")
+    other = broker.subscribe("u2")
+
+    broker.publish("u1", created("t1"))
+
+    assert first.get(0) == created("t1")
+    assert second.get(0) == created("t1")
+    assert other.get(0) is None
+
+
+def test_listeners_see_every_event():
+    broker = EventBroker(LocalBackend())
+    seen = []
+    broker.add_listener(lambda user_id, event: seen.append((user_id, event["type"])))
+
+    broker.publish("u1", created("t1"))
+    broker.publish("u2", {"type": "transaction.deleted", "transaction_id": "t2"})
+
+    assert seen == [("u1", "transaction.created"), ("u2", "transaction.deleted")]
+
+
+def test_failing_listener_does_not_block_subscribers():
+    broker = EventBroker(LocalBackend())
+    subscription = broker.subscribe("u1")
+
+    def broken(user_id, event):
+        raise RuntimeError("boom")
+
+    broker.add_listener(broken)
+    broker.publish("u1", created("t1"))
+
+    assert subscription.get(0) == created("t1")
+
+
+def test_unsubscribed_clients_stop_receiving_events():
+    broker = EventBroker(LocalBackend())
+    subscription = broker.subscribe("u1")
+    broker.unsubscribe(subscription)
+    broker.unsubscribe(subscription)
+
+    broker.publish("u1", created("t1"))
+
+    assert subscription.get(0) is None
+    assert "u1" not in broker._subscribers
+
+
+def test_overflow_drops_backlog_and_asks_for_resync():
+    subscription = Subscription("u1", maxsize=2)
+    for i in range(5):
+        subscription.push(created(f"t{i}"))
+
+    assert subscription.get(0) == {"type": "resync"}
+    assert subscription.get(0) is None
+
+    subscription.push(created("t9"))
+    assert subscription.get(0) == created("t9")
+
+
+def test_resync_all_reaches_listeners_and_subscribers():
+    broker = EventBroker(LocalBackend())
+    seen = []
+    broker.add_listener(lambda user_id, event: seen.append((user_id, event["type"])))
+    first = broker.subscribe("u1")
+    second = broker.subscribe("u2")
+
+    broker._resync_all()
+
+    assert seen == [(None, "resync")]
+    assert first.get(0) == {"type": "resync"}
+    assert second.get(0) == {"type": "resync"}
+
+
+class FakeCursor:
+    def __init__(self, sent: list) -> None:
+        self.sent = sent
+
+    def execute(self, sql, params=None) -> None:
+        self.sent.append(params[1])
+
+
+class FakeConnection:
+    def __init__(self, sent: list) -> None:
+        self.sent = sent
+
+    def cursor(self):
+        return FakeCursor(self.sent)
+
+    def commit(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class FakeEngine:
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+
+    def raw_connection(self):
+        return FakeConnection(self.sent)
+
+
+def test_postgres_backend_replaces_oversized_payloads_with_resync():
+    engine = FakeEngine()
+    backend = PostgresBackend(engine)
+    delivered = []
+    backend.deliver = lambda user_id, event: delivered.append(event["type"])
+
+    large = {"type": "transaction.created", "transaction": {"description": "x" * 9000}}
+    backend.publish("u1", large)
+    backend.publish("u1", {"type": "transaction.deleted", "transaction_id": "t1"})
+
+    messages = [json.loads(payload) for payload in engine.sent]
+    assert [m["event"]["type"] for m in messages] == ["resync", "transaction.deleted"]
+    assert all(len(payload.encode("utf-8")) < MAX_NOTIFY_BYTES for payload in engine.sent)
+    assert delivered == ["transaction.created", "transaction.deleted"]
+
+
+def test_format_sse():
+    assert format_sse({"type": "ready"}) == 'event: ready\ndata: {"type": "ready"}\n\n'
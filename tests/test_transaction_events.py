@@ -0,0 +1,31 @@
+import time
+
+from internal.services import jwt_service
+
+
+def test_event_stream_ends_when_the_token_expires(app):
+    cfg = app.config["APP_CONFIG"]
+    token = jwt_service.encode_token(
+        {"user_id": "u1", "username": "u1", "role": "user", "exp": int(time.time()) + 2},
+        cfg.jwt_secret,
+    )
+    client = app.test_client()
+
+    started = time.monotonic()
+    resp = client.get(f"/api/v1/transactions/events?access_token={token}", buffered=True)
+
+    body = resp.get_data(as_text=True)
+    assert resp.status_code == 200
+    assert body.startswith("event: ready\n")
+    assert body.rstrip().splitlines()[-2] == "event: token_expired"
+    assert time.monotonic() - started < 10
+
+
+def test_event_stream_rejects_expired_tokens(app):
+    cfg = app.config["APP_CONFIG"]
+    token = jwt_service.encode_token(
+        {"user_id": "u1", "username": "u1", "role": "user", "exp": int(time.time()) - 1},
+        cfg.jwt_secret,
+    )
+    resp = app.test_client().get(f"/api/v1/transactions/events?access_token={token}")
+    assert resp.status_code == 401